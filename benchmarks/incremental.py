@@ -0,0 +1,110 @@
+"""Check and time the incremental refresh against full builds.
+
+Synthetic raw tables are generated, then the appended tables are replayed in
+steps: an initial build, a day with nothing appended, a day with only new
+transactions, a day with only new advisory rows and a day with both. After
+every step the refreshed dataset must match a full build of the same files.
+The advisory rows are sorted by period end, so that appended rows move
+forward in time like the daily exports do.
+
+Run from the repository root:
+
+    python -m benchmarks.incremental --clients 5000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from clients_dataset import incremental
+from clients_dataset.build import create_dataset
+from clients_dataset.raw_tables import TABLES, RawTables
+from clients_dataset.synthetic_data import generate
+
+# Define each step by its name and the fraction of the advisory and transaction rows present
+STEPS = [
+    ("initial build", 0.8, 0.8),
+    ("nothing appended", 0.8, 0.8),
+    ("transactions only", 0.8, 0.9),
+    ("advisory only", 0.9, 0.9),
+    ("both appended", 1.0, 1.0),
+]
+
+
+def read_lines(path, sort_column=None):
+    # Read the lines of a raw table, sorting the data lines by a tab-separated column if given
+    with open(path) as handle:
+        header, *lines = handle.readlines()
+    if sort_column is not None:
+        lines.sort(key=lambda line: line.split("\t")[sort_column])
+    return header, lines
+
+
+def write_prefix(path, header, lines, fraction):
+    # Write the header and the first 'fraction' of the data lines
+    with open(path, "w") as handle:
+        handle.write(header)
+        handle.writelines(lines[: int(len(lines) * fraction)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Generate the complete raw tables, and copy the static ones to the replayed directory
+    source_dir = generate(tempfile.mkdtemp(), args.clients, seed=args.seed)
+    data_dir = tempfile.mkdtemp()
+    for name in incremental.STATIC_TABLES:
+        shutil.copy(os.path.join(source_dir, TABLES[name][0]), data_dir)
+    advisory_file = TABLES["advisory_performance"][0]
+    transactions_file = TABLES["transactions"][0]
+    advisory = read_lines(os.path.join(source_dir, advisory_file), sort_column=2)
+    transactions = read_lines(os.path.join(source_dir, transactions_file))
+
+    print(
+        "{:<18}  {:>8}  {:>11}  {:>11}  {:>5}".format(
+            "step", "touched", "refresh s", "full s", "match"
+        )
+    )
+    state_path = os.path.join(data_dir, "incremental_state.pickle")
+    for name, advisory_fraction, transactions_fraction in STEPS:
+        write_prefix(
+            os.path.join(data_dir, advisory_file), *advisory, advisory_fraction
+        )
+        write_prefix(
+            os.path.join(data_dir, transactions_file),
+            *transactions,
+            transactions_fraction
+        )
+
+        start = time.perf_counter()
+        dataset, touched = incremental.refresh(data_dir, state_path)
+        refresh_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        full = create_dataset(0, RawTables(data_dir))
+        full_seconds = time.perf_counter() - start
+
+        try:
+            pd.testing.assert_frame_equal(dataset, full)
+            matches = True
+        except AssertionError:
+            matches = False
+        print(
+            "{:<18}  {:>8d}  {:>11.3f}  {:>11.3f}  {:>5}".format(
+                name,
+                len(touched),
+                refresh_seconds,
+                full_seconds,
+                "yes" if matches else "NO",
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Compare the accuracy and speed of the KNN KernelSHAP explanations.
+
+The baseline is the original call of the notebook: KernelExplainer on the
+whole training set as background, on one core and without the prediction
+cache. Every other configuration summarizes the background (k-means or a
+stratified sample of each size), caches the predictions and explains the
+rows on a process pool. Its SHAP values are compared to the baseline ones.
+Finally the rows are explained one after another with the largest stratified
+background, to check that the prediction cache answers rows of later
+explained rows from those of earlier ones.
+
+Run from the repository root, on the preprocessed dataset or on synthetic
+data:
+
+    python -m benchmarks.knn_shap --dataset data/clients_dataset.feather --rows 20
+    python -m benchmarks.knn_shap --clients 5000 --sizes 10 25 50 100
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+import shap
+from sklearn.model_selection import train_test_split
+
+from churn_models.explain import (
+    BACKGROUND_METHODS,
+    CachedPredictions,
+    cache_rows,
+    explain_shap,
+    kernel_row,
+    predict_proba,
+    summarize_background,
+)
+from churn_models.models import churn_column, make_model, split_dataset
+from clients_dataset.build import create_dataset
+from clients_dataset.feature_store import read_features
+from clients_dataset.raw_tables import RawTables
+from clients_dataset.synthetic_data import generate
+
+
+def baseline_values(model, background, data, nsamples, seed):
+    # Explain the rows like the notebook did, with the same per-row seeds as explain_shap()
+    explainer = shap.KernelExplainer(
+        predict_proba(model, list(data.columns)), background
+    )
+    column = churn_column(model)
+    return np.array(
+        [
+            kernel_row(explainer, data.iloc[[i]], column, nsamples, seed + i)[0]
+            for i in range(len(data))
+        ]
+    )
+
+
+def cache_reuse(model, background, data, nsamples, seed):
+    # Explain the rows one after another on one cached explainer, counting for each row after the
+    # first the share of its predictions answered by the rows cached for the earlier ones
+    predictions = CachedPredictions(predict_proba(model, list(data.columns)))
+    explainer = shap.KernelExplainer(predictions, background)
+    predictions.max_rows = cache_rows(nsamples, data.shape[1], explainer.N)
+    column = churn_column(model)
+    shares = []
+    for i in range(len(data)):
+        queries, hits = predictions.queries, predictions.hits
+        kernel_row(explainer, data.iloc[[i]], column, nsamples, seed + i)
+        if i > 0:
+            shares.append((predictions.hits - hits) / (predictions.queries - queries))
+    return {
+        "max_rows": predictions.max_rows,
+        "queries": predictions.queries,
+        "evaluated": predictions.evaluated,
+        "hit_share_after_first_row": float(np.mean(shares)) if shares else 0.0,
+    }
+
+
+def compare(values, reference, top):
+    # Measure the error of SHAP values against the reference ones, and the agreement of the
+    # 'top' most important features by mean absolute value
+    error = np.abs(values - reference)
+    ranking = np.argsort(-np.abs(values).mean(axis=0))[:top]
+    reference_ranking = np.argsort(-np.abs(reference).mean(axis=0))[:top]
+    return {
+        "mean_abs_error": float(error.mean()),
+        "max_abs_error": float(error.max()),
+        "relative_error": float(error.sum() / np.abs(reference).sum()),
+        "top_features_agreement": len(set(ranking) & set(reference_ranking)) / top,
+    }
+
+
+def load_dataset(args):
+    # Read the preprocessed dataset, or build one from synthetic raw tables
+    if args.dataset:
+        return read_features(args.dataset)
+    tables = RawTables(generate(tempfile.mkdtemp(), args.clients, seed=args.seed))
+    return create_dataset(0, tables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", help="preprocessed dataset (default: synthetic)")
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument(
+        "--methods", nargs="+", choices=BACKGROUND_METHODS, default=BACKGROUND_METHODS
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--nsamples", type=int, default=500)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--report", help="path of the JSON report")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Fit the KNN pipeline on the training split, and explain the first test rows
+    X, y = split_dataset(load_dataset(args))
+    X_train, X_test, y_train, _ = train_test_split(
+        X, y, test_size=0.2, random_state=args.seed, stratify=y
+    )
+    knn = make_model("knn").fit(X_train, y_train)
+    data = X_test.iloc[: args.rows]
+
+    start = time.perf_counter()
+    reference = baseline_values(knn, X_train, data, args.nsamples, args.seed)
+    baseline_seconds = time.perf_counter() - start
+    results = [
+        dict(
+            method="full",
+            size=len(X_train),
+            workers=1,
+            seconds=baseline_seconds,
+            speedup=1.0,
+            **compare(reference, reference, args.top)
+        )
+    ]
+
+    for method in args.methods:
+        for size in args.sizes:
+            start = time.perf_counter()
+            explanation = explain_shap(
+                knn,
+                X_train,
+                data,
+                nsamples=args.nsamples,
+                seed=args.seed,
+                background_size=size,
+                background_method=method,
+                background_labels=y_train,
+                workers=args.workers,
+            )
+            seconds = time.perf_counter() - start
+            results.append(
+                dict(
+                    method=method,
+                    size=size,
+                    workers=args.workers,
+                    seconds=seconds,
+                    speedup=baseline_seconds / seconds,
+                    **compare(explanation.values, reference, args.top)
+                )
+            )
+
+    print(
+        "{:<8}  {:>6}  {:>7}  {:>9}  {:>8}  {:>10}  {:>10}  {:>9}  {:>6}".format(
+            "method",
+            "size",
+            "workers",
+            "seconds",
+            "speed-up",
+            "mean err",
+            "max err",
+            "rel err",
+            "top-k",
+        )
+    )
+    for result in results:
+        print(
+            "{method:<8}  {size:>6d}  {workers:>7d}  {seconds:>9.2f}  {speedup:>7.1f}x  "
+            "{mean_abs_error:>10.5f}  {max_abs_error:>10.5f}  {relative_error:>8.1%}  "
+            "{top_features_agreement:>6.0%}".format(**result)
+        )
+
+    # Check that the cache reuses the predictions of earlier rows with the largest background
+    size = max(args.sizes)
+    background = summarize_background(X_train, size, "sample", y_train, args.seed)
+    reuse = cache_reuse(knn, background, data, args.nsamples, args.seed)
+    print(
+        "\ncache with a stratified background of {:d} rows: {:d} rows kept, {:d} queries, "
+        "{:d} evaluated, {:.1%} of each row after the first answered from earlier "
+        "rows".format(
+            size,
+            reuse["max_rows"],
+            reuse["queries"],
+            reuse["evaluated"],
+            reuse["hit_share_after_first_row"],
+        )
+    )
+    if args.report:
+        with open(args.report, "w") as handle:
+            json.dump({"results": results, "cache": reuse}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark the market-window engine against the original per-client loop.
+
+Run from the repository root:
+
+    python -m benchmarks.mkt_performance --clients 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from clients_dataset.build import market_index, market_windows
+from clients_dataset.windows import WindowSpec
+
+
+def legacy_market_windows(mkt_performance, market_performance, n):
+    # Original implementation: filter the whole market series for every client and window
+    day = n + 28
+    names = WindowSpec().names("MARKET_PERFORMANCE")
+    mkt_performance = mkt_performance.copy()
+    for i in range(0, 6):
+        monthly_performance = []
+        for k, row in mkt_performance.iterrows():
+            mkt_performance_X_months = market_performance[
+                (
+                    market_performance.DATA
+                    >= (row["LAST_DATE"] - pd.to_timedelta(day, unit="d"))
+                )
+                & (
+                    market_performance.DATA
+                    < (row["LAST_DATE"] - pd.to_timedelta(day - 28, unit="d"))
+                )
+            ]
+            single_monthly_perf = mkt_performance_X_months["REND_GIORN"].sum()
+            monthly_performance.append(single_monthly_perf)
+        new_col = pd.DataFrame(monthly_performance)
+        new_col = new_col.set_index(mkt_performance.index)
+        mkt_performance.insert(i, names[i], new_col)
+        day += 28
+    return mkt_performance
+
+
+def synthetic_inputs(num_clients, num_years, seed):
+    # Generate a daily market series and one last advisory date per client
+    rng = np.random.RandomState(seed)
+    market_dates = pd.bdate_range("2019-11-29", periods=num_years * 261, freq="-1B")
+    market_performance = pd.DataFrame(
+        {
+            "DATA": market_dates[::-1],
+            "REND_GIORN": rng.normal(0, 1, len(market_dates)).round(4),
+        }
+    )
+    last_dates = pd.Timestamp("2019-11-29") - pd.to_timedelta(
+        rng.randint(0, 365, num_clients), unit="d"
+    )
+    clients = pd.DataFrame(
+        {"ID_CLIENTE": np.arange(num_clients), "LAST_DATE": last_dates}
+    )
+    return clients, market_performance
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    clients, market_performance = synthetic_inputs(args.clients, args.years, args.seed)
+
+    legacy, legacy_time = timed(
+        legacy_market_windows, clients, market_performance, args.offset
+    )
+    vectorized, vectorized_time = timed(
+        lambda: market_windows(clients, market_index(market_performance), args.offset)
+    )
+
+    # Both implementations must produce the same MARKET_PERFORMANCE_* columns
+    pd.testing.assert_frame_equal(legacy, vectorized, check_exact=False)
+
+    print("clients:         {:d}".format(args.clients))
+    print("market days:     {:d}".format(len(market_performance)))
+    print("per-client loop: {:.3f} s".format(legacy_time))
+    print("window engine:   {:.3f} s".format(vectorized_time))
+    print("speed-up:        {:.1f}x".format(legacy_time / vectorized_time))
+
+
+if __name__ == "__main__":
+    main()
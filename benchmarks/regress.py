@@ -0,0 +1,56 @@
+"""Benchmark the batched REGRESS slopes against per-row scipy linregress.
+
+Run from the repository root:
+
+    python -m benchmarks.regress --rows 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from clients_dataset.build import REGRESS
+
+
+def legacy_regress(data):
+    # Original implementation: one scipy linregress call per row
+    x_axis = list(range(len(data.columns) - 1, -1, -1))
+    results = []
+    for row in data.to_numpy():
+        result = stats.linregress(x_axis, row)
+        results.append((result.slope, result.intercept, result.rvalue, result.stderr))
+    return pd.DataFrame(results, columns=["slope", "intercept", "r_value", "std_err"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(args.seed)
+    data = pd.DataFrame(rng.normal(0, 100, (args.rows, args.columns)))
+
+    start = time.perf_counter()
+    legacy = legacy_regress(data)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = REGRESS(data, full=True)
+    batched_time = time.perf_counter() - start
+
+    # The batched results must match linregress to floating-point tolerance
+    pd.testing.assert_frame_equal(legacy, batched, check_exact=False, rtol=1e-9)
+
+    print("rows:              {:d}".format(args.rows))
+    print("scipy linregress:  {:.3f} s".format(legacy_time))
+    print("batched REGRESS:   {:.3f} s".format(batched_time))
+    print("speed-up:          {:.1f}x".format(legacy_time / batched_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Benchmark how the dataset build scales with the number of clients.
+
+For every size, synthetic raw tables are generated, then the dataset is built
+with each implementation (in memory, on a process pool, sharded, and in
+batch mode) in a fresh process, so that the peak memory of each run is its
+own. The outputs of all implementations must match the in-memory build.
+
+Run from the repository root:
+
+    python -m benchmarks.scaling --clients 10000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from clients_dataset import sharded_build
+from clients_dataset.build import (
+    create_dataset,
+    create_datasets,
+    profile_dataset,
+    save_dataset,
+)
+from clients_dataset.feature_store import read_features
+from clients_dataset.profiling import peak_rss
+from clients_dataset.raw_tables import TABLES, RawTables
+from clients_dataset.synthetic_data import generate
+
+IMPLEMENTATIONS = ["in_memory", "workers", "sharded", "batch"]
+
+
+def build(implementation, data_dir, output, workers, shards, offsets):
+    # Build the dataset of day offset 0 with one implementation and write it to the feature store
+    start = time.perf_counter()
+    stages = None
+    if implementation == "in_memory":
+        dataset, report = profile_dataset(0, RawTables(data_dir))
+        stages = report["stages"]
+    elif implementation == "workers":
+        dataset = create_dataset(0, RawTables(data_dir), workers=workers)
+    elif implementation == "sharded":
+        dataset = sharded_build.create_dataset(0, data_dir=data_dir, shards=shards)
+    else:
+        dataset = create_datasets(offsets, tables=RawTables(data_dir))[0]
+    seconds = time.perf_counter() - start
+    save_dataset(dataset, output)
+    return {
+        "implementation": implementation,
+        "seconds": seconds,
+        "rows": len(dataset),
+        "peak_rss_bytes": peak_rss(),
+        "children_peak_rss_bytes": peak_rss(children=True),
+        "stages": stages,
+    }
+
+
+def run(implementation, data_dir, output, workers, shards, offsets):
+    # Run one build in a fresh process, so that its peak memory is not shared with other builds
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(
+            build, implementation, data_dir, output, workers, shards, offsets
+        ).result()
+
+
+def benchmark_size(clients, data_dir, args):
+    # Generate the raw tables once per size, reusing the ones of an earlier run
+    data_dir = os.path.join(data_dir, "clients_{:d}".format(clients))
+    if not os.path.exists(os.path.join(data_dir, TABLES["clients"][0])):
+        generate(data_dir, clients=clients, seed=args.seed)
+    input_bytes = sum(
+        os.path.getsize(os.path.join(data_dir, file)) for file, _ in TABLES.values()
+    )
+
+    # Build the dataset with every implementation, the in-memory one first as the reference
+    offsets = sorted(set([0] + args.offsets))
+    results = []
+    for implementation in args.implementations:
+        output = os.path.join(data_dir, implementation + ".feather")
+        result = run(
+            implementation, data_dir, output, args.workers, args.shards, offsets
+        )
+        result["clients"] = clients
+        result["input_bytes"] = input_bytes
+        result["clients_per_second"] = clients / result["seconds"]
+        if implementation == "batch":
+            result["snapshots"] = len(offsets)
+        results.append(result)
+
+        # Check that the output matches the reference build
+        reference = os.path.join(data_dir, args.implementations[0] + ".feather")
+        try:
+            pd.testing.assert_frame_equal(
+                read_features(reference),
+                read_features(output),
+                check_dtype=False,
+                check_categorical=False,
+            )
+            result["matches"] = True
+        except AssertionError as error:
+            result["matches"] = False
+            result["mismatch"] = str(error)
+    return results
+
+
+def print_results(results):
+    print(
+        "{:>10}  {:<10}  {:>9}  {:>11}  {:>13}  {:>5}".format(
+            "clients", "build", "seconds", "clients/s", "peak RSS MiB", "match"
+        )
+    )
+    for result in results:
+        peak = max(
+            result["peak_rss_bytes"] or 0, result["children_peak_rss_bytes"] or 0
+        )
+        print(
+            "{:>10d}  {:<10}  {:>9.2f}  {:>11.0f}  {:>13.1f}  {:>5}".format(
+                result["clients"],
+                result["implementation"],
+                result["seconds"],
+                result["clients_per_second"],
+                peak / 2**20,
+                "yes" if result["matches"] else "NO",
+            )
+        )
+
+    # Print the throughput of each stage of the in-memory builds
+    for result in results:
+        if result["stages"] is None:
+            continue
+        print("\nstages of the in-memory build, {:d} clients".format(result["clients"]))
+        for stage in result["stages"]:
+            rows = stage["rows_in"] or stage.get("rows_out") or 0
+            print(
+                "  {:<16}  {:>8.3f} s  {:>12.0f} rows/s  {:>+9.1f} MiB peak".format(
+                    stage["stage"],
+                    stage["wall_seconds"],
+                    rows / stage["wall_seconds"] if stage["wall_seconds"] else 0,
+                    (stage["rss_peak_increase_bytes"] or 0) / 2**20,
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument(
+        "--implementations",
+        nargs="+",
+        choices=IMPLEMENTATIONS,
+        default=IMPLEMENTATIONS,
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--offsets", type=int, nargs="+", default=[0, 28, 56])
+    parser.add_argument("--data-dir", help="directory of the generated raw tables")
+    parser.add_argument("--report", help="path of the JSON report")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="clients_scaling_")
+    results = []
+    for clients in args.clients:
+        results.extend(benchmark_size(clients, data_dir, args))
+
+    print_results(results)
+    if args.report:
+        with open(args.report, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measure the latency of the scoring service under concurrent requests.
+
+The service is started in this process on synthetic data, then a number of
+client threads send single-client scoring requests, with and without
+micro-batching.
+
+Run from the repository root:
+
+    python -m benchmarks.scoring_service --clients 5000 --threads 16
+"""
+
+import argparse
+import http.client
+import json
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from churn_models.models import fit_models
+from churn_models.service import make_server
+from clients_dataset.build import create_dataset
+from clients_dataset.raw_tables import RawTables
+from clients_dataset.synthetic_data import generate
+
+
+def client_thread(port, client_ids, requests, latencies):
+    # Send single-client scoring requests over one keep-alive connection
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    rng = np.random.RandomState(threading.get_ident() % 2**32)
+    for client in rng.choice(client_ids, requests):
+        body = json.dumps({"clients": [int(client)]})
+        start = time.perf_counter()
+        connection.request("POST", "/score", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def measure(models, tables, client_ids, args, max_batch):
+    # Start a service and send the requests of every thread at once
+    server = make_server(models, tables, port=0, max_batch=max_batch)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    latencies = []
+    threads = [
+        threading.Thread(
+            target=client_thread,
+            args=(server.server_address[1], client_ids, args.requests, latencies),
+        )
+        for _ in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    return np.array(latencies) * 1000, len(latencies) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Generate the raw tables and fit the models on the whole dataset
+    tables = RawTables(generate(tempfile.mkdtemp(), args.clients, seed=args.seed))
+    dataset = create_dataset(0, tables, keep_id=True)
+    models = fit_models(dataset.drop("ID_CLIENTE", axis=1), random_state=args.seed)
+    client_ids = dataset["ID_CLIENTE"].to_numpy()
+
+    print(
+        "{:<14}  {:>9}  {:>9}  {:>9}  {:>11}".format(
+            "batching", "p50 ms", "p99 ms", "max ms", "requests/s"
+        )
+    )
+    for label, max_batch in [("none", 1), ("micro-batch", 256)]:
+        latencies, throughput = measure(models, tables, client_ids, args, max_batch)
+        print(
+            "{:<14}  {:>9.2f}  {:>9.2f}  {:>9.2f}  {:>11.0f}".format(
+                label,
+                np.percentile(latencies, 50),
+                np.percentile(latencies, 99),
+                latencies.max(),
+                throughput,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Fit, evaluate, serve and explain the churn prediction models.
+
+Like ``clients_dataset``, the public names are imported from their submodule
+on first access, so that importing the package does not load scikit-learn.
+"""
+
+import importlib
+
+# Map each public name to the submodule defining it
+_EXPORTS = {
+    "cross_validate_models": "evaluation",
+    "explain_shap": "explain",
+    "ExplanationStore": "explanation_store",
+    "explain_lime": "lime_explain",
+    "MODEL_NAMES": "models",
+    "ModelSet": "models",
+    "fit_models": "models",
+    "load_models": "models",
+    "make_model": "models",
+    "make_server": "service",
+    "score_features": "batch_scoring",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    # Import the submodule defining a public name on first access (PEP 562)
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,141 @@
+"""Score every client of the feature store with the saved churn models.
+
+The feature store is read in fixed-size chunks of rows, each worker process
+memory-mapping it and loading the model set once, so that memory stays
+bounded by the chunks in flight whatever the number of clients. The churn
+probability of every model is written as one float32 column of an Arrow IPC
+(Feather) file, one record batch per chunk, next to the client IDs. The
+store must keep the ID_CLIENTE column, so build it with ``--keep-id``.
+
+Run from the repository root:
+
+    python -m clients_dataset --keep-id
+    python -m churn_models.batch_scoring --models data/models.pickle \\
+        --features data/clients_dataset.feather --output data/churn_scores.feather
+"""
+
+import argparse
+import collections
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from clients_dataset.feature_store import FeatureStore
+
+from .models import ID_COLUMN, load_models
+
+
+def check_store(store, path):
+    # Refuse a store without client IDs, whose scores could not be matched to the clients
+    if ID_COLUMN not in store.columns:
+        raise ValueError(
+            "feature store {!r} has no {} column, build it with "
+            "'python -m clients_dataset --keep-id'".format(path, ID_COLUMN)
+        )
+
+
+def score_chunk(models, store, start, stop, names=None):
+    # Score the rows [start, stop) of the store with every model, next to their client IDs
+    X = store.read(models.features, start, stop).to_numpy(dtype=float)
+    columns = {ID_COLUMN: store.read([ID_COLUMN], start, stop)[ID_COLUMN].to_numpy()}
+    for name, values in models.churn_probability(X, names).items():
+        columns[name] = values.astype(np.float32)
+    return columns
+
+
+# Model set and feature store of the worker processes, loaded once per worker
+_worker_state = None
+
+
+def _init_worker(models_path, features_path):
+    global _worker_state
+    _worker_state = load_models(models_path), FeatureStore(features_path)
+
+
+def _score_chunk(start, stop, names):
+    return score_chunk(*_worker_state, start, stop, names)
+
+
+def score_features(
+    models_path,
+    features_path,
+    output,
+    names=None,
+    chunk_size=65536,
+    workers=None,
+):
+    # Score the feature store chunk by chunk and write the probabilities in row order, keeping at
+    # most two chunks per worker in flight; return the number of rows and the elapsed seconds
+    import pyarrow as pa
+
+    start_time = time.perf_counter()
+    store = FeatureStore(features_path)
+    check_store(store, features_path)
+    ranges = [
+        (start, min(start + chunk_size, len(store)))
+        for start in range(0, len(store), chunk_size)
+    ]
+
+    def write(columns):
+        nonlocal writer
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values) for values in columns.values()], names=list(columns)
+        )
+        if writer is None:
+            writer = pa.ipc.new_file(output, batch.schema)
+        writer.write_batch(batch)
+
+    writer = None
+    try:
+        if workers:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(models_path, features_path),
+            ) as pool:
+                pending = collections.deque()
+                for start, stop in ranges:
+                    pending.append(pool.submit(_score_chunk, start, stop, names))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        else:
+            models = load_models(models_path)
+            for start, stop in ranges:
+                write(score_chunk(models, store, start, stop, names))
+    finally:
+        if writer is not None:
+            writer.close()
+    return len(store), time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", default="data/models.pickle")
+    parser.add_argument("--features", default="data/clients_dataset.feather")
+    parser.add_argument("--output", default="data/churn_scores.feather")
+    parser.add_argument("--model-names", nargs="+", help="default: every saved model")
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    rows, seconds = score_features(
+        args.models,
+        args.features,
+        args.output,
+        args.model_names,
+        args.chunk_size,
+        args.workers,
+    )
+    print(args.output)
+    print(
+        "scored {:d} rows in {:.2f} s ({:.0f} rows/s)".format(
+            rows, seconds, rows / seconds if seconds else 0
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Cross-validation of the churn models with a single fit per fold.
+
+Each fold model is fitted once and predicts its test fold, on a process pool
+running the folds of every model at once. The scores of each fold and the
+confusion matrix are then derived from the same out-of-fold predictions,
+instead of fitting every model again for ``cross_val_predict``.
+
+The fold splits and the fitted fold models can be cached on disk, keyed by a
+hash of the dataset and of the split and model parameters, so that a rerun
+only fits the models whose parameters changed.
+"""
+
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.base import clone
+from sklearn.metrics import (
+    accuracy_score,
+    confusion_matrix,
+    f1_score,
+    precision_score,
+    recall_score,
+)
+
+from clients_dataset.table_cache import write_pickle
+
+from .models import CHURN
+
+# Define the classes, in the order of the confusion matrix
+NO_CHURN = "NO CHURN"
+CLASSES = [CHURN, NO_CHURN]
+
+# Map each score to its metric and arguments, named like the scorers of the notebook
+METRICS = {
+    "accuracy": (accuracy_score, {}),
+    "precision_NO_CHURN": (
+        precision_score,
+        {"pos_label": NO_CHURN, "zero_division": 0},
+    ),
+    "precision_CHURN": (precision_score, {"pos_label": CHURN, "zero_division": 0}),
+    "recall_NO_CHURN": (recall_score, {"pos_label": NO_CHURN, "zero_division": 0}),
+    "recall_CHURN": (recall_score, {"pos_label": CHURN, "zero_division": 0}),
+    "f1_NO_CHURN": (f1_score, {"pos_label": NO_CHURN, "zero_division": 0}),
+    "f1_CHURN": (f1_score, {"pos_label": CHURN, "zero_division": 0}),
+}
+
+
+def dataset_hash(X, y):
+    # Hash the values, index and column names of the features and the labels
+    digest = hashlib.sha256()
+    digest.update(repr(list(X.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    digest.update(
+        pd.util.hash_pandas_object(pd.Series(y), index=False).to_numpy().tobytes()
+    )
+    return digest.hexdigest()
+
+
+def params_hash(*parts):
+    # Hash the parameters of splitters and estimators through their repr, with the scikit-learn
+    # version since fitted models are only valid for the version that pickled them
+    digest = hashlib.sha256(sklearn.__version__.encode())
+    for part in parts:
+        if hasattr(part, "get_params"):
+            part = (type(part).__name__, sorted(part.get_params().items()))
+        digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def _read_cache(path):
+    try:
+        with open(path, "rb") as handle:
+            return pickle.load(handle)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def fit_fold(model, X, y, train, test):
+    # Fit a copy of the model on the training rows and predict the test rows
+    start = time.perf_counter()
+    fitted = clone(model).fit(X.iloc[train], y[train])
+    fit_time = time.perf_counter() - start
+    return fitted, fitted.predict(X.iloc[test]), fit_time
+
+
+# Dataset of the worker processes, sent once per worker
+_worker_data = None
+
+
+def _init_worker(X, y):
+    global _worker_data
+    _worker_data = X, y
+
+
+def _fit_fold(model, train, test):
+    return fit_fold(model, *_worker_data, train, test)
+
+
+def fold_scores(y, predictions, splits):
+    # Score every fold from the out-of-fold predictions, like cross_validate does
+    scores = {}
+    for name, (metric, kwargs) in METRICS.items():
+        scores["test_" + name] = np.array(
+            [metric(y[test], predictions[test], **kwargs) for _, test in splits]
+        )
+    return scores
+
+
+def confusion_table(y, predictions):
+    # Count the out-of-fold predictions of each class against the true ones
+    return pd.DataFrame(
+        confusion_matrix(y, predictions, labels=CLASSES),
+        index=["true:" + label for label in CLASSES],
+        columns=["pred:" + label for label in CLASSES],
+    )
+
+
+def cross_validate_models(models, X, y, cv, workers=None, cache_dir=None):
+    # Cross-validate every model on the same folds, given as a dict or (name, model) pairs, and
+    # return for each model the keys of cross_validate (estimator, fit_time and the test_ scores)
+    # with its out-of-fold predictions
+    models = dict(models)
+    y = np.asarray(y)
+
+    # Split the rows into folds, reading the splits of an earlier run if cached
+    splits = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        data_key = params_hash(dataset_hash(X, y), cv)
+        splits_path = os.path.join(cache_dir, "splits_{}.pickle".format(data_key[:16]))
+        splits = _read_cache(splits_path)
+    if splits is None:
+        splits = list(cv.split(X, y))
+        if cache_dir is not None:
+            write_pickle(splits_path, splits)
+
+    # Read the fold models of an earlier run if cached, and list the folds left to fit
+    folds = {(name, i): None for name in models for i in range(len(splits))}
+    paths = {}
+    if cache_dir is not None:
+        for name, i in folds:
+            key = params_hash(data_key, models[name], i)
+            paths[name, i] = os.path.join(cache_dir, "fold_{}.pickle".format(key[:16]))
+            folds[name, i] = _read_cache(paths[name, i])
+    tasks = [task for task, fold in folds.items() if fold is None]
+
+    # Fit the missing folds of every model at once, sending the dataset once per worker
+    arguments = [(models[name], splits[i][0], splits[i][1]) for name, i in tasks]
+    if workers and tasks:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(X, y)
+        ) as pool:
+            fitted = list(pool.map(_fit_fold, *zip(*arguments)))
+    else:
+        fitted = [
+            fit_fold(model, X, y, train, test) for model, train, test in arguments
+        ]
+    for task, fold in zip(tasks, fitted):
+        folds[task] = fold
+        if task in paths:
+            write_pickle(paths[task], fold)
+
+    # Gather the out-of-fold predictions of each model and score them
+    results = {}
+    for name in models:
+        predictions = np.empty(len(y), dtype=y.dtype)
+        for i, (_, test) in enumerate(splits):
+            predictions[test] = folds[name, i][1]
+        results[name] = dict(
+            estimator=[folds[name, i][0] for i in range(len(splits))],
+            fit_time=np.array([folds[name, i][2] for i in range(len(splits))]),
+            predictions=predictions,
+            **fold_scores(y, predictions, splits)
+        )
+    return results
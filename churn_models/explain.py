@@ -0,0 +1,268 @@
+"""SHAP explanations of the churn models with the fastest exact algorithm.
+
+* Tree ensembles (random forest, extra trees, decision tree) use the
+  path-dependent TreeExplainer, exact and without background data. The
+  values explain the churn probability, like KernelExplainer on predict_proba.
+* Linear models (logistic regression) use LinearExplainer, exact for the
+  log-odds of the churn class given the background data.
+* Any other model (KNN) falls back to KernelExplainer on predict_proba. Its
+  cost grows with the background size, so the background can be summarized
+  (k-means centroids or a stratified sample), the explained rows can be split
+  across a process pool, and the predictions of repeated rows are cached.
+
+Every explanation is a ``shap.Explanation`` of the churn class, ready for the
+bar, beeswarm, heatmap and waterfall plots.
+"""
+
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shap
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+
+from .models import CHURN
+
+# Define the models explained by TreeExplainer and LinearExplainer
+TREE_MODELS = (RandomForestClassifier, ExtraTreesClassifier, DecisionTreeClassifier)
+LINEAR_MODELS = (LogisticRegression,)
+
+# Define the methods summarizing the background data of KernelExplainer
+BACKGROUND_METHODS = ["kmeans", "sample"]
+
+
+def split_model(model):
+    # Split a pipeline into the function applying its preprocessing steps and its final estimator
+    if isinstance(model, Pipeline):
+        if len(model.steps) == 1:
+            return (lambda X: X), model.steps[-1][1]
+        return model[:-1].transform, model.steps[-1][1]
+    return (lambda X: X), model
+
+
+def explainer_kind(model):
+    # Name the explainer used for a model: "tree", "linear" or "kernel"
+    _, estimator = split_model(model)
+    if isinstance(estimator, TREE_MODELS):
+        return "tree"
+    if isinstance(estimator, LINEAR_MODELS) and len(estimator.classes_) == 2:
+        return "linear"
+    return "kernel"
+
+
+def class_values(shap_values, column):
+    # Select the SHAP values of one class, returned as a list per class by older shap versions
+    # and as a (rows, features, classes) array by newer ones
+    if isinstance(shap_values, list):
+        return np.asarray(shap_values[column])
+    shap_values = np.asarray(shap_values)
+    return shap_values[..., column] if shap_values.ndim == 3 else shap_values
+
+
+def predict_proba(model, feature_names):
+    # Get the predict_proba function of a model, passing DataFrames to models fitted on them
+    if getattr(model, "feature_names_in_", None) is None:
+        return model.predict_proba
+    return lambda X: model.predict_proba(pd.DataFrame(X, columns=feature_names))
+
+
+class CachedPredictions:
+    """Predict function evaluating every distinct row only once.
+
+    KernelExplainer evaluates the model on mixes of the explained row and the
+    background rows, many of which repeat, within a row and across rows; for
+    KNN each evaluation is a neighbour query. Rows are keyed by their bytes,
+    and the least recently used rows are evicted beyond ``max_rows`` rows.
+    ``hits`` counts the rows answered by the predictions of earlier calls.
+    """
+
+    def __init__(self, predict, max_rows=200_000):
+        self.predict = predict
+        self.max_rows = max_rows
+        self.queries = 0
+        self.evaluated = 0
+        self.hits = 0
+        self._rows = collections.OrderedDict()
+
+    def __call__(self, X):
+        X = np.ascontiguousarray(X, dtype=float)
+        keys = [row.tobytes() for row in X]
+
+        # Mark the cached rows as recently used, and evaluate the distinct missing rows in a single
+        # call
+        missing = {}
+        for i, key in enumerate(keys):
+            if key in self._rows:
+                self._rows.move_to_end(key)
+                self.hits += 1
+            elif key not in missing:
+                missing[key] = i
+        new = {}
+        if missing:
+            new = dict(zip(missing, self.predict(X[list(missing.values())])))
+        output = np.array([new[key] if key in new else self._rows[key] for key in keys])
+
+        # Store the new rows, evicting the least recently used ones beyond the bound
+        self._rows.update(new)
+        while len(self._rows) > self.max_rows:
+            self._rows.popitem(last=False)
+        self.queries += len(keys)
+        self.evaluated += len(new)
+        return output
+
+
+def cache_rows(nsamples, features, background_rows):
+    # Get the number of rows one KernelExplainer call evaluates, nsamples mixes of the explained row
+    # with every background row ('auto' draws 2 * features + 2048 samples), so that the cache holds
+    # the rows of the previous call while the next one looks them up
+    if nsamples == "auto":
+        nsamples = 2 * features + 2048
+    return nsamples * background_rows
+
+
+def summarize_background(background, size, method="kmeans", labels=None, seed=None):
+    # Summarize the background data of KernelExplainer into 'size' rows: k-means centroids weighted
+    # by their cluster size and rounded to values of the data, or a random sample stratified by
+    # 'labels' if given
+    if method not in BACKGROUND_METHODS:
+        raise ValueError(
+            "method must be one of {}, got {!r}".format(
+                ", ".join(BACKGROUND_METHODS), method
+            )
+        )
+    if size >= len(background):
+        return background
+    if method == "kmeans":
+        return shap.kmeans(background, size)
+    sample, _ = train_test_split(
+        background, train_size=size, stratify=labels, random_state=seed
+    )
+    return sample
+
+
+def kernel_explainer(model, background, feature_names, nsamples="auto"):
+    # Create a KernelExplainer on the cached predicted probabilities of a model, sizing the cache
+    # from the number of samples and the background rows it counted
+    predictions = CachedPredictions(predict_proba(model, feature_names))
+    explainer = shap.KernelExplainer(predictions, background)
+    predictions.max_rows = cache_rows(nsamples, len(feature_names), explainer.N)
+    return explainer
+
+
+def kernel_row(explainer, row, column, nsamples="auto", seed=None):
+    # Explain one row with KernelExplainer, which samples the feature coalitions from the global
+    # NumPy random state: seed it for this row, then restore it
+    state = np.random.get_state()
+    if seed is not None:
+        np.random.seed(seed)
+    try:
+        values = explainer.shap_values(row, nsamples=nsamples, silent=True)
+    finally:
+        np.random.set_state(state)
+    return class_values(values, column)[0], np.ravel(explainer.expected_value)[column]
+
+
+# Explainer of the worker processes, created once per worker
+_worker_explainer = None
+
+
+def _init_worker(model, background, feature_names, nsamples):
+    global _worker_explainer
+    _worker_explainer = kernel_explainer(model, background, feature_names, nsamples)
+
+
+def _kernel_row(row, column, nsamples, seed):
+    return kernel_row(_worker_explainer, row, column, nsamples, seed)
+
+
+def kernel_explain(
+    model, background, data, column, nsamples="auto", seed=None, workers=None
+):
+    # Explain every row of 'data' with KernelExplainer, seeding row i with seed + i so that the
+    # values do not depend on the number of workers
+    rows = [data.iloc[[i]] for i in range(len(data))]
+    seeds = [None if seed is None else seed + i for i in range(len(data))]
+    columns = [column] * len(rows)
+    samples = [nsamples] * len(rows)
+    if workers:
+        # Send the model and the background once per worker, and the rows in a few chunks each
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(model, background, list(data.columns), nsamples),
+        ) as pool:
+            results = list(
+                pool.map(
+                    _kernel_row,
+                    rows,
+                    columns,
+                    samples,
+                    seeds,
+                    chunksize=max(1, len(rows) // (workers * 4)),
+                )
+            )
+    else:
+        explainer = kernel_explainer(model, background, list(data.columns), nsamples)
+        results = list(
+            map(kernel_row, [explainer] * len(rows), rows, columns, samples, seeds)
+        )
+    return np.array([values for values, _ in results]), results[0][1]
+
+
+def explain_shap(
+    model,
+    background,
+    data,
+    display_data=None,
+    class_name=CHURN,
+    nsamples="auto",
+    seed=None,
+    background_size=None,
+    background_method="kmeans",
+    background_labels=None,
+    workers=None,
+):
+    # Explain the predictions of a fitted model for every row of 'data', shown with the values of
+    # 'display_data' if given (e.g. the unscaled features of a model fitted on scaled ones)
+    feature_names = list(data.columns)
+    transform, estimator = split_model(model)
+    column = list(estimator.classes_).index(class_name)
+    kind = explainer_kind(model)
+
+    if kind == "tree":
+        # Exact path-dependent algorithm: the tree leaves hold the class probabilities
+        explainer = shap.TreeExplainer(estimator)
+        values = class_values(
+            explainer.shap_values(transform(data), check_additivity=False), column
+        )
+        base_value = np.ravel(explainer.expected_value)[column]
+    elif kind == "linear":
+        # Exact linear algorithm on the log-odds of the second class, negated for the first one
+        explainer = shap.LinearExplainer(estimator, transform(background))
+        values = np.asarray(explainer.shap_values(transform(data)))
+        base_value = np.ravel(explainer.expected_value)[0]
+        if column == 0:
+            values, base_value = -values, -base_value
+    else:
+        # Model-agnostic fallback on the predicted probabilities, on a summary of 'background_size'
+        # background rows if given, and on a pool of 'workers' processes if given
+        if background_size is not None:
+            background = summarize_background(
+                background, background_size, background_method, background_labels, seed
+            )
+        values, base_value = kernel_explain(
+            model, background, data, column, nsamples, seed, workers
+        )
+
+    display_data = data if display_data is None else display_data
+    return shap.Explanation(
+        values,
+        base_value,
+        display_data.to_numpy(dtype=float),
+        feature_names=feature_names,
+    )
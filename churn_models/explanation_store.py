@@ -0,0 +1,217 @@
+"""Persistent store of SHAP explanations, so that each row is explained once.
+
+Explanations are grouped in tables, one per model, background data and
+explainer options, each keyed by a SHA-256 hash of the pickled model, of the
+background values and of the options. A table holds one row per explained
+feature vector, keyed by its 64-bit pandas hash:
+
+* ``rows.npy``: the row hashes
+* ``values.npy``: the SHAP values of the rows
+* ``data.npy``: the feature values shown in the plots
+* ``manifest.json``: feature names, base value and the global summaries of
+  the bar plot over all stored rows (mean and mean absolute SHAP value of
+  every feature)
+
+The arrays are memory-mapped, so that looking up the explanation of a client
+reads only its row. Rows already in a table are never explained again.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import shap
+
+from clients_dataset.table_cache import write_atomic, write_json
+
+from .explain import explain_shap
+
+# Bump when the layout of the tables or the values of the explainers change
+STORE_VERSION = 1
+
+
+def frame_hash(frame):
+    # Hash the values and column names of a DataFrame, or the values of a Series
+    digest = hashlib.sha256()
+    if isinstance(frame, pd.DataFrame):
+        digest.update(repr(list(frame.columns)).encode())
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    digest.update(hashes.tobytes())
+    return digest.hexdigest()
+
+
+def model_hash(model):
+    # Hash the pickled fitted model, identical for models fitted identically
+    return hashlib.sha256(pickle.dumps(model, protocol=4)).hexdigest()
+
+
+def row_hashes(data):
+    # Hash the feature values of every row, whatever its index
+    return pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+
+def _write_array(path, array):
+    def write(temporary_path):
+        with open(temporary_path, "wb") as handle:
+            np.save(handle, array)
+
+    write_atomic(path, write)
+
+
+class ExplanationTable:
+    """Stored explanations of one model, background data and explainer options."""
+
+    def __init__(self, path, model, background, options):
+        self.path = path
+        self.model = model
+        self.background = background
+        self.options = options
+        self._load()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _load(self):
+        # Map the arrays of the table, ignoring a table left incomplete by an interrupted run
+        self.manifest = None
+        self._rows = np.empty(0, dtype=np.uint64)
+        self._positions = {}
+        try:
+            with open(os.path.join(self.path, "manifest.json")) as handle:
+                manifest = json.load(handle)
+            arrays = [
+                np.load(os.path.join(self.path, name + ".npy"), mmap_mode="r")
+                for name in ("rows", "values", "data")
+            ]
+        except (OSError, ValueError):
+            return
+        if manifest["version"] != STORE_VERSION or any(
+            len(array) != manifest["rows"] for array in arrays
+        ):
+            return
+        self.manifest = manifest
+        self._rows, self._values, self._data = arrays
+        self._positions = {key: i for i, key in enumerate(self._rows.tolist())}
+
+    def _append(self, keys, explanation):
+        # Rewrite the arrays with the new rows, then the manifest with the global summaries
+        values = np.asarray(explanation.values, dtype=float)
+        data = np.asarray(explanation.data, dtype=float)
+        if self.manifest is not None:
+            keys = np.concatenate([self._rows, keys])
+            values = np.concatenate([self._values, values])
+            data = np.concatenate([self._data, data])
+        os.makedirs(self.path, exist_ok=True)
+        _write_array(os.path.join(self.path, "rows.npy"), keys)
+        _write_array(os.path.join(self.path, "values.npy"), values)
+        _write_array(os.path.join(self.path, "data.npy"), data)
+
+        manifest = {
+            "version": STORE_VERSION,
+            "rows": len(keys),
+            "feature_names": list(explanation.feature_names),
+            "base_value": float(np.ravel(explanation.base_values)[0]),
+            "mean_abs": np.abs(values).mean(axis=0).tolist(),
+            "mean": values.mean(axis=0).tolist(),
+        }
+        write_json(os.path.join(self.path, "manifest.json"), manifest)
+        self._load()
+
+    def explain(self, data, display_data=None, workers=None):
+        # Explain the rows of 'data' missing from the table, then read every row from the table
+        keys = row_hashes(data)
+        new = []
+        seen = set(self._positions)
+        for i, key in enumerate(keys.tolist()):
+            if key not in seen:
+                seen.add(key)
+                new.append(i)
+        if new:
+            display_data = data if display_data is None else display_data
+            explanation = explain_shap(
+                self.model,
+                self.background,
+                data.iloc[new],
+                display_data=display_data.iloc[new],
+                workers=workers,
+                **self.options
+            )
+            self._append(keys[new], explanation)
+        return self.lookup(data)
+
+    def lookup(self, data):
+        # Read the stored explanations of the rows of 'data', without running any explainer
+        keys = row_hashes(data).tolist()
+        missing = [i for i, key in enumerate(keys) if key not in self._positions]
+        if missing:
+            raise KeyError(
+                "{:d} rows are not explained yet, e.g. row {!r}".format(
+                    len(missing), data.index[missing[0]]
+                )
+            )
+        positions = [self._positions[key] for key in keys]
+        return shap.Explanation(
+            np.asarray(self._values[positions]),
+            np.full(len(positions), self.manifest["base_value"]),
+            np.asarray(self._data[positions]),
+            feature_names=self.manifest["feature_names"],
+        )
+
+    def _means(self, data=None):
+        # Get the mean absolute and mean SHAP values over the rows of 'data', or over every stored
+        # row, read from the manifest
+        if data is None:
+            return self.manifest["mean_abs"], self.manifest["mean"]
+        values = self.lookup(data).values
+        return np.abs(values).mean(axis=0), values.mean(axis=0)
+
+    def summary(self, data=None):
+        # Get the mean and mean absolute SHAP value of every feature over the rows of 'data', or
+        # over every stored row, most important first
+        mean_abs, mean = self._means(data)
+        summary = pd.DataFrame(
+            {"mean_abs": mean_abs, "mean": mean},
+            index=self.manifest["feature_names"],
+        )
+        return summary.sort_values("mean_abs", ascending=False)
+
+    def global_importance(self, data=None):
+        # Get the mean absolute SHAP values over the rows of 'data', or over every stored row, as an
+        # explanation ready for the bar plot
+        return shap.Explanation(
+            np.asarray(self._means(data)[0]),
+            feature_names=self.manifest["feature_names"],
+        )
+
+
+class ExplanationStore:
+    """Directory of explanation tables.
+
+    ``options`` are the keyword arguments of ``churn_models.explain.explain_shap``
+    that change the SHAP values, like ``nsamples`` or ``background_size``.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def table(self, model, background, **options):
+        # Open the table of a model, background data and explainer options
+        digest = hashlib.sha256(model_hash(model).encode())
+        digest.update(frame_hash(background).encode())
+        for name, value in sorted(options.items()):
+            if isinstance(value, (pd.DataFrame, pd.Series)):
+                value = frame_hash(value)
+            digest.update(repr((name, value)).encode())
+        path = os.path.join(self.directory, digest.hexdigest()[:16])
+        return ExplanationTable(path, model, background, options)
+
+    def explain(
+        self, model, background, data, display_data=None, workers=None, **options
+    ):
+        # Explain the rows of 'data', reusing the stored explanations
+        return self.table(model, background, **options).explain(
+            data, display_data, workers
+        )
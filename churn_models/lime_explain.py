@@ -0,0 +1,178 @@
+"""Batched LIME explanations of the churn models.
+
+This is the tabular LIME algorithm of ``lime.LimeTabularExplainer`` with
+continuous features (``discretize_continuous=False``), computed for many
+clients at once:
+
+* The perturbations are drawn around the training mean, so one set of
+  perturbations is shared by every client; the model scores it once, with a
+  single ``predict_proba`` call per chunk of rows.
+* Only the exponential kernel weights depend on the client. The weighted
+  ridge surrogates of a chunk of clients are fitted together, as one batch of
+  normal equations built with batched matrix products and solved by
+  ``np.linalg.solve``.
+* Chunks of clients can be spread across a pool of worker processes.
+
+The surrogate of a client is linear in the standardized features, so its
+prediction is its intercept plus one term per feature. The explanation is a
+``shap.Explanation`` of those terms, with the intercepts as base values,
+ready for the same plots as the SHAP explanations.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shap
+
+from .explain import predict_proba, split_model
+from .models import CHURN
+
+
+def perturbations(training_data, num_samples, seed=None):
+    # Draw standard normal perturbations of the standardized features, like LIME does when it
+    # samples around the training mean, and map them to feature values
+    mean = training_data.to_numpy(dtype=float).mean(axis=0)
+    scale = training_data.to_numpy(dtype=float).std(axis=0)
+    scale[scale == 0] = 1
+    standardized = np.random.RandomState(seed).normal(size=(num_samples, len(mean)))
+    return standardized, standardized * scale + mean, mean, scale
+
+
+def batch_predict(predict, X, chunk_size):
+    # Score the rows with one call of the predict function per chunk
+    return np.concatenate(
+        [
+            predict(X[start : start + chunk_size])
+            for start in range(0, len(X), chunk_size)
+        ]
+    )
+
+
+def fit_surrogates(standardized, target, rows, row_target, kernel_width, alpha):
+    # Fit the weighted ridge surrogate of each row on the shared perturbations and the row itself,
+    # as a batch of normal equations with an unpenalized intercept
+    design = np.hstack([np.ones((len(standardized), 1)), standardized])
+    row_design = np.hstack([np.ones((len(rows), 1)), rows])
+
+    # Weight the perturbations by the kernel of their euclidean distance to each row, which has
+    # weight 1 for itself
+    distances = (
+        (standardized**2).sum(axis=1)[None, :]
+        - 2 * rows @ standardized.T
+        + (rows**2).sum(axis=1)[:, None]
+    )
+    weights = np.sqrt(np.exp(-np.maximum(distances, 0) / kernel_width**2))
+
+    gram = (design.T[None, :, :] * weights[:, None, :]) @ design
+    gram += np.einsum("ri,rj->rij", row_design, row_design)
+    gram[:, np.arange(1, design.shape[1]), np.arange(1, design.shape[1])] += alpha
+    moments = (weights * target) @ design + row_design * row_target[:, None]
+    coefficients = np.linalg.solve(gram, moments[..., None])[..., 0]
+
+    # Score each surrogate with its weighted R^2 on the perturbations, like LIME's score
+    residuals = target - coefficients @ design.T
+    centered = target - (weights @ target / weights.sum(axis=1))[:, None]
+    score = 1 - (weights * residuals**2).sum(axis=1) / (weights * centered**2).sum(
+        axis=1
+    )
+    return coefficients[:, 0], coefficients[:, 1:], score
+
+
+# Shared perturbations of the worker processes, sent once per worker
+_worker_samples = None
+
+
+def _init_worker(standardized, target, kernel_width, alpha):
+    global _worker_samples
+    _worker_samples = standardized, target, kernel_width, alpha
+
+
+def _fit_surrogates(rows, row_target):
+    standardized, target, kernel_width, alpha = _worker_samples
+    return fit_surrogates(standardized, target, rows, row_target, kernel_width, alpha)
+
+
+def local_surrogates(
+    model,
+    training_data,
+    data,
+    class_name=CHURN,
+    num_samples=5000,
+    kernel_width=None,
+    alpha=1.0,
+    seed=None,
+    workers=None,
+    chunk_size=64,
+):
+    # Fit the LIME surrogate of the class probability for every row of 'data', returning the
+    # intercepts, the coefficients of the standardized features and the surrogate scores
+    feature_names = list(data.columns)
+    _, estimator = split_model(model)
+    column = list(estimator.classes_).index(class_name)
+    if kernel_width is None:
+        kernel_width = np.sqrt(len(feature_names)) * 0.75
+
+    # Score the shared perturbations and the rows once, in chunks
+    standardized, samples, mean, scale = perturbations(training_data, num_samples, seed)
+    predict = predict_proba(model, feature_names)
+    target = batch_predict(predict, samples, 10 * chunk_size)[:, column]
+    rows = (data.to_numpy(dtype=float) - mean) / scale
+    row_target = batch_predict(predict, data.to_numpy(dtype=float), 10 * chunk_size)
+    row_target = row_target[:, column]
+
+    # Fit the surrogates of each chunk of rows at once, on a pool of processes if given
+    starts = range(0, len(rows), chunk_size)
+    chunks = [rows[start : start + chunk_size] for start in starts]
+    chunk_targets = [row_target[start : start + chunk_size] for start in starts]
+    if workers:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(standardized, target, kernel_width, alpha),
+        ) as pool:
+            results = list(pool.map(_fit_surrogates, chunks, chunk_targets))
+    else:
+        results = [
+            fit_surrogates(
+                standardized, target, chunk, chunk_target, kernel_width, alpha
+            )
+            for chunk, chunk_target in zip(chunks, chunk_targets)
+        ]
+    intercepts, coefficients, scores = (
+        np.concatenate(parts) for parts in zip(*results)
+    )
+    return intercepts, coefficients, scores, rows
+
+
+def explain_lime(
+    model,
+    training_data,
+    data,
+    display_data=None,
+    class_name=CHURN,
+    num_samples=5000,
+    kernel_width=None,
+    alpha=1.0,
+    seed=None,
+    workers=None,
+):
+    # Explain the class probability of every row of 'data' with its LIME surrogate, shown with the
+    # values of 'display_data' if given (e.g. the unscaled features of a model fitted on scaled ones)
+    intercepts, coefficients, _, rows = local_surrogates(
+        model,
+        training_data,
+        data,
+        class_name,
+        num_samples,
+        kernel_width,
+        alpha,
+        seed,
+        workers,
+    )
+    display_data = data if display_data is None else display_data
+    return shap.Explanation(
+        coefficients * rows,
+        intercepts,
+        display_data.to_numpy(dtype=float),
+        feature_names=list(data.columns),
+    )
@@ -0,0 +1,119 @@
+"""Fit, save and load the churn prediction models of the notebook.
+
+The three models are scikit-learn pipelines so that any preprocessing, like
+the StandardScaler in front of KNN, travels with the fitted model:
+
+* ``logistic_regression``: LogisticRegression
+* ``random_forest``: RandomForestClassifier
+* ``knn``: StandardScaler + KNeighborsClassifier
+
+Run from the repository root to fit them on the whole dataset:
+
+    python -m churn_models.models --dataset data/clients_dataset.feather --output data/models.pickle
+"""
+
+import argparse
+import pickle
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from clients_dataset.table_cache import write_pickle
+
+# Define the name of the label column, of the client ID column and of the positive class
+LABEL = "PREDICTION"
+ID_COLUMN = "ID_CLIENTE"
+CHURN = "CHURN"
+
+# Define the models, in the order of the notebook
+MODEL_NAMES = ["logistic_regression", "random_forest", "knn"]
+
+
+def make_model(name, random_state=None):
+    # Create an unfitted model pipeline with the settings of the notebook
+    if name == "logistic_regression":
+        return make_pipeline(LogisticRegression(max_iter=10_000_000_000))
+    if name == "random_forest":
+        return make_pipeline(RandomForestClassifier(random_state=random_state))
+    if name == "knn":
+        return make_pipeline(StandardScaler(), KNeighborsClassifier())
+    raise ValueError(
+        "model must be one of {}, got {!r}".format(", ".join(MODEL_NAMES), name)
+    )
+
+
+def split_dataset(dataset):
+    # Split the dataset into the features and the label, leaving out the client ID if it was kept
+    features = dataset.drop(LABEL, axis=1).drop(ID_COLUMN, axis=1, errors="ignore")
+    return features, dataset[LABEL].astype(str)
+
+
+def fit_models(dataset, names=None, random_state=None):
+    # Fit every model on the feature matrix of the dataset, keeping the feature names aside so that
+    # scoring takes plain arrays
+    X, y = split_dataset(dataset)
+    models = {}
+    for name in names or MODEL_NAMES:
+        models[name] = make_model(name, random_state).fit(X.to_numpy(dtype=float), y)
+    return ModelSet(models, list(X.columns))
+
+
+def churn_column(model):
+    # Get the column of the churn probability in the output of predict_proba
+    return list(model.classes_).index(CHURN)
+
+
+class ModelSet:
+    """Fitted model pipelines sharing the same feature columns."""
+
+    def __init__(self, models, features):
+        self.models = models
+        self.features = features
+        self.sklearn_version = sklearn.__version__
+
+    def churn_probability(self, X, names=None):
+        # Get the churn probability of every row of a feature matrix for each model
+        X = np.asarray(X, dtype=float)
+        probabilities = {}
+        for name in names or self.models:
+            model = self.models[name]
+            probabilities[name] = model.predict_proba(X)[:, churn_column(model)]
+        return probabilities
+
+    def save(self, path):
+        # Write the model set atomically, so that a running service never reads a partial file
+        write_pickle(path, self)
+
+
+def load_models(path):
+    # Read a model set written by ModelSet.save
+    with open(path, "rb") as handle:
+        return pickle.load(handle)
+
+
+def main():
+    from clients_dataset import read_features
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default="data/clients_dataset.feather")
+    parser.add_argument("--output", default="data/models.pickle")
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES)
+    parser.add_argument("--random-state", type=int, default=42)
+    args = parser.parse_args()
+
+    models = fit_models(read_features(args.dataset), args.models, args.random_state)
+    models.save(args.output)
+    print(args.output)
+
+
+if __name__ == "__main__":
+    # Run the main function of the imported module rather than of __main__, so that the pickle
+    # references churn_models.models.ModelSet and loads in any other process
+    from churn_models.models import main
+
+    main()
@@ -0,0 +1,314 @@
+"""Local HTTP scoring service for the churn models.
+
+The service keeps the fitted model pipelines and the feature vector of every
+client in memory. Concurrent scoring requests are gathered by a micro-batcher
+thread, so that each model runs predict_proba once per batch instead of once
+per request. New raw rows of a client are turned into its feature vector with
+the same builders as ``create_dataset``.
+
+Run from the repository root:
+
+    python -m churn_models.service --models data/models.pickle --data-dir data
+
+Endpoints (JSON bodies):
+
+* ``GET /health``: number of clients and models
+* ``POST /score`` ``{"clients": [7, 14], "models": ["knn"]}``: churn
+  probability of each client for each model (all models if not given)
+* ``POST /clients`` ``{"tables": {"clients": [...], "contracts": [...], ...}}``:
+  rebuild the feature vectors of the clients from their raw rows, one list of
+  records per raw table
+"""
+
+import argparse
+import io
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from clients_dataset.build import create_dataset
+from clients_dataset.feature_store import compact
+from clients_dataset.raw_tables import SEPARATORS, TABLES, RawTables
+from clients_dataset.windows import window_spec
+
+from .models import load_models
+
+# Define the prefixes of the one-hot columns, missing from a build whose clients lack a category
+DUMMY_PREFIXES = ("PSC_",)
+
+
+def parse_rows(name, records, columns):
+    # Parse the records of a raw table with the reader of its CSV file, so that the values are
+    # cleaned exactly like the files read by create_dataset
+    frame = pd.DataFrame.from_records(records, columns=columns)
+    text = frame.to_csv(sep=SEPARATORS[name], index=False)
+    return TABLES[name][1](io.StringIO(text))
+
+
+class ClientFeatures:
+    """Feature vectors of the clients, keyed by client ID.
+
+    ``raw_columns`` maps each raw table to its columns and ``market_performance``
+    is the parsed market series, shared by every client.
+    """
+
+    def __init__(self, features, windows, raw_columns, market_performance):
+        self.features = features
+        self.windows = window_spec(windows)
+        self.raw_columns = raw_columns
+        self.market_performance = market_performance
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def update(self, dataset):
+        # Store the feature vectors of a dataset built with keep_id=True, with the compact dtypes of
+        # the feature store the models were fitted on, and 0 for the missing one-hot columns
+        missing = [
+            column
+            for column in self.features
+            if column not in dataset.columns and not column.startswith(DUMMY_PREFIXES)
+        ]
+        if missing:
+            raise ValueError(
+                "the built dataset lacks the model features {}".format(missing)
+            )
+        matrix = compact(dataset.reindex(columns=self.features, fill_value=0))
+        matrix = matrix.to_numpy(dtype=float)
+        client_ids = [int(client) for client in dataset["ID_CLIENTE"]]
+        with self._lock:
+            self._rows.update(zip(client_ids, matrix))
+        return client_ids
+
+    def materialize(self, tables):
+        # Build the feature vectors of the clients from their raw rows, given as records per table
+        frames = {
+            name: parse_rows(name, tables.get(name, []), columns)
+            for name, columns in self.raw_columns.items()
+            if name != "market_performance"
+        }
+        frames["market_performance"] = self.market_performance
+        dataset = create_dataset(
+            self.windows, RawTables(None, frames=frames), keep_id=True
+        )
+        updated = self.update(dataset)
+
+        # Report the clients without features, e.g. without advisory data in every window, and forget
+        # their previous feature vectors so that they are no longer scored with stale features
+        clients = [int(client) for client in frames["clients"]["ID_CLIENTE"]]
+        dropped = sorted(set(clients) - set(updated))
+        with self._lock:
+            for client in dropped:
+                self._rows.pop(client, None)
+        return updated, dropped
+
+    def matrix(self, client_ids):
+        # Stack the feature vectors of the known clients, and list the unknown ones
+        with self._lock:
+            rows = [self._rows.get(client) for client in client_ids]
+        known = [client for client, row in zip(client_ids, rows) if row is not None]
+        missing = [client for client, row in zip(client_ids, rows) if row is None]
+        rows = [row for row in rows if row is not None]
+        if not rows:
+            return known, missing, np.empty((0, len(self.features)))
+        return known, missing, np.vstack(rows)
+
+
+class MicroBatcher:
+    """Score the rows of concurrent requests together on a background thread.
+
+    A batch is closed when it holds ``max_batch`` rows or ``max_delay``
+    seconds after its first request, whichever comes first.
+    """
+
+    def __init__(self, models, max_batch=256, max_delay=0.002):
+        self.models = models
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def score(self, X):
+        # Get the churn probability of each row for every model, waiting for its batch
+        future = Future()
+        self._queue.put((X, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            # Wait for a first request, then gather the others until the batch is full or due
+            batch = [self._queue.get()]
+            rows = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_delay
+            while rows < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                rows += len(batch[-1][0])
+            self._score(batch)
+
+    def _score(self, batch):
+        # Run every model once on the stacked rows and hand each request its own slice
+        try:
+            probabilities = self.models.churn_probability(
+                np.vstack([X for X, _ in batch])
+            )
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        start = 0
+        for X, future in batch:
+            stop = start + len(X)
+            future.set_result(
+                {name: values[start:stop] for name, values in probabilities.items()}
+            )
+            start = stop
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """JSON endpoints of the scoring service."""
+
+    # Keep the connections alive and send small replies at once, without Nagle's algorithm delay
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._reply(404, {"error": "unknown path " + self.path})
+        self._reply(
+            200,
+            {
+                "clients": len(self.server.features),
+                "models": list(self.server.models.models),
+            },
+        )
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        except (TypeError, ValueError) as error:
+            return self._reply(400, {"error": "invalid JSON body: {}".format(error)})
+        try:
+            if self.path == "/score":
+                self._score(body)
+            elif self.path == "/clients":
+                updated, dropped = self.server.features.materialize(body["tables"])
+                self._reply(200, {"updated": updated, "dropped": dropped})
+            else:
+                self._reply(404, {"error": "unknown path " + self.path})
+        except KeyError as error:
+            self._reply(400, {"error": "missing field {}".format(error)})
+        except (TypeError, ValueError) as error:
+            self._reply(400, {"error": "invalid field: {}".format(error)})
+
+    def _score(self, body):
+        names = body.get("models") or list(self.server.models.models)
+        unknown = [name for name in names if name not in self.server.models.models]
+        if unknown:
+            return self._reply(400, {"error": "unknown models {}".format(unknown)})
+
+        # Look up the feature vectors of the clients and score them with the other requests
+        known, missing, X = self.server.features.matrix(
+            [int(client) for client in body["clients"]]
+        )
+        probabilities = self.server.batcher.score(X) if len(X) else {}
+        scores = {
+            str(client): {name: float(probabilities[name][i]) for name in names}
+            for i, client in enumerate(known)
+        }
+        self._reply(200, {"scores": scores, "missing": missing})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep the request log out of the latency path unless asked for
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(
+    models,
+    tables,
+    windows=0,
+    host="127.0.0.1",
+    port=8000,
+    max_batch=256,
+    max_delay=0.002,
+    verbose=False,
+):
+    # Build the feature vectors of every client of the raw tables, then serve them
+    windows = window_spec(windows)
+    features = ClientFeatures(
+        models.features,
+        windows,
+        {name: list(tables[name].columns) for name in TABLES},
+        tables["market_performance"],
+    )
+    features.update(create_dataset(windows, tables, keep_id=True))
+
+    server = ThreadingHTTPServer((host, port), ScoringHandler)
+    server.daemon_threads = True
+    server.models = models
+    server.features = features
+    server.batcher = MicroBatcher(models, max_batch, max_delay)
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", default="data/models.pickle")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--cache-dir", help="default: DATA_DIR/cache")
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    tables = RawTables(
+        args.data_dir, args.cache_dir or os.path.join(args.data_dir, "cache")
+    )
+    server = make_server(
+        load_models(args.models),
+        tables,
+        args.offset,
+        args.host,
+        args.port,
+        args.max_batch,
+        args.max_delay_ms / 1000,
+        args.verbose,
+    )
+    print(
+        "serving {:d} clients on http://{}:{:d}".format(
+            len(server.features), args.host, args.port
+        )
+    )
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Build the clients churn dataset from the raw advisory tables.
+
+The public names are imported from their submodule on first access, so that
+importing the package (e.g. in a scoring service that only needs the window
+specification or the feature store) does not load the whole pipeline:
+
+    import clients_dataset
+
+    dataset = clients_dataset.create_dataset(0, clients_dataset.RawTables("data"))
+"""
+
+import importlib
+
+# Map each public name to the submodule defining it
+_EXPORTS = {
+    "assemble_dataset": "build",
+    "build_features": "build",
+    "create_dataset": "build",
+    "create_datasets": "build",
+    "feature_builders": "build",
+    "iter_datasets": "build",
+    "profile_dataset": "build",
+    "save_dataset": "build",
+    "FeatureStore": "feature_store",
+    "read_features": "feature_store",
+    "write_features": "feature_store",
+    "refresh": "incremental",
+    "BuildProfile": "profiling",
+    "profiled": "profiling",
+    "RawTables": "raw_tables",
+    "generate": "synthetic_data",
+    "WindowSpec": "windows",
+    "window_spec": "windows",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    # Import the submodule defining a public name on first access (PEP 562)
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
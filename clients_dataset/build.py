@@ -0,0 +1,682 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from .feature_store import write_features
+from .profiling import profiled, stage
+from .raw_tables import TABLES, RawTables
+from .windows import window_spec
+
+# Define data directory
+data_dir = "data"
+
+# Define the directory of the columnar cache of the parsed raw tables
+cache_dir = data_dir + "/cache"
+
+
+def raw_tables(tables):
+    # Use the shared raw tables if given, otherwise read them from the data directory
+    if tables is None:
+        tables = RawTables(data_dir, cache_dir)
+    return tables
+
+
+def contract_events(tables):
+    # Sort the contracts by client and attach the churn date of each client, the maximum "DATA_CHIUSURA" value
+    contracts = tables["contracts"].sort_values("CLIENTE", kind="mergesort")
+    contracts = contracts.reset_index(drop=True)
+    contracts["CHURN_DATE"] = contracts.groupby("CLIENTE")["DATA_CHIUSURA"].transform(
+        "max"
+    )
+
+    # Locate the first contract of each client in the sorted arrays
+    client_ids, group_start = np.unique(
+        contracts["CLIENTE"].to_numpy(), return_index=True
+    )
+    return contracts, client_ids, group_start
+
+
+def advisory_events(tables):
+    # Attach to every Advisory Performance row the last date of its client, the maximum "DT_FINE_PERIODO" value
+    advisory_performance = tables["advisory_performance"]
+    last_date = (
+        advisory_performance.groupby("ID_CLIENTE")["DT_FINE_PERIODO"]
+        .max()
+        .rename("LAST_DATE")
+    )
+    return pd.merge(advisory_performance, last_date, on="ID_CLIENTE")
+
+
+def market_index(market_performance):
+    # Sort the market series by date, ignoring rows without a valid date
+    market_performance = market_performance.dropna(subset=["DATA"]).sort_values(
+        "DATA", kind="mergesort"
+    )
+    market_dates = market_performance["DATA"].to_numpy()
+
+    # Build a cumulative sum index of the daily returns, so that the sum over any
+    # date window is the difference of two prefix sums
+    cumulative_returns = np.concatenate(
+        ([0.0], market_performance["REND_GIORN"].fillna(0).to_numpy(float).cumsum())
+    )
+    return market_dates, cumulative_returns
+
+
+def market_events(tables):
+    # Build the cumulative market index of the Market Performance data of the raw tables
+    return market_index(tables["market_performance"])
+
+
+def purchase_events(tables):
+    # Keep only the contract ID and closing date of the Contracts data, renaming them for the merge
+    contracts = tables["contracts"][["ID", "DATA_CHIUSURA"]].rename(
+        columns={"ID": "ID_CONTRATTO", "DATA_CHIUSURA": "LAST_DATE"}
+    )
+
+    # Keep only the purchases of the Transactions data, with the columns used by the investments
+    transactions = tables["transactions"]
+    purchases = transactions.loc[
+        transactions.NOME == "ACQUISTO TITOLI",
+        ["ID_CLIENTE", "ID_CONTRATTO", "DATA_CONTABILE", "IMP_LORDO"],
+    ]
+
+    # Reduce the purchases to their sum and count per client, contract and day before the merge
+    purchases = (
+        purchases.groupby(["ID_CLIENTE", "ID_CONTRATTO", "DATA_CONTABILE"])["IMP_LORDO"]
+        .agg(["sum", "count"])
+        .reset_index()
+    )
+
+    # Merge the daily purchases with the closing date of their contract
+    purchases = pd.merge(purchases, contracts, on="ID_CONTRATTO")
+
+    # Get the clients with at least one transaction on a known contract, that all get investments
+    client_ids = np.unique(
+        transactions.loc[
+            transactions.ID_CONTRATTO.isin(contracts.ID_CONTRATTO), "ID_CLIENTE"
+        ]
+    )
+    return purchases, client_ids
+
+
+def clients(tables=None):
+    # Get the Clients data from the raw tables
+    clients = raw_tables(tables)["clients"]
+
+    # Drop unnecessary columns from the Clients data
+    clients = clients.drop(
+        [
+            "DATA_DECESSO",
+            "TIPO_SOGGETTO_DESC",
+            "DATAINSERIMENTO",
+            "TIPO_CATEGORIA",
+            "ID_FILIALE",
+            "SESSO",
+            "ID_AGENTE",
+            "STATUS_DESC",
+        ],
+        axis=1,
+    )
+
+    # Perform one-hot encoding on the "PSC" column of the Clients data
+    clients = pd.get_dummies(clients, prefix_sep="_", columns=["PSC"])
+
+    # Return the modified Clients data
+    return clients
+
+
+def contracts(windows, tables=None):
+    # Get the window specification, given either directly or as a day offset
+    windows = window_spec(windows)
+
+    # Get the Contracts data sorted by client, with the churn date of each client, from the raw tables
+    contracts, client_ids, group_start = raw_tables(tables).derived(
+        "contract_events", contract_events
+    )
+
+    # Calculate the cut-off dates of all windows at once, one column per window before the churn date
+    cut_off = (
+        contracts["CHURN_DATE"].to_numpy()[:, np.newaxis]
+        - pd.to_timedelta(windows.days, unit="d").to_numpy()[np.newaxis, :]
+    )
+    opening_date = contracts["DATA_APERTURA"].to_numpy()[:, np.newaxis]
+    closing_date = contracts["DATA_CHIUSURA"].to_numpy()[:, np.newaxis]
+    status = contracts["STATO"].to_numpy()[:, np.newaxis]
+
+    # Flag each contract as active or closed currently and at every cut-off date
+    flags = np.hstack(
+        [
+            status == 1,
+            (closing_date > cut_off) & (opening_date < cut_off),
+            status == 2,
+            (closing_date < cut_off) & (status == 2),
+        ]
+    )
+    columns = (
+        ["ACTIVE_CONTRACTS_CURRENTLY"]
+        + windows.names_before("ACTIVE_CONTRACTS")
+        + ["CLOSED_CONTRACTS_CURRENTLY"]
+        + windows.names_before("CLOSED_CONTRACTS")
+    )
+
+    # Count the active and closed contracts of each client for all windows with a single reduction over the sorted clients
+    contracts = pd.DataFrame(
+        np.add.reduceat(flags.astype(int), group_start, axis=0), columns=columns
+    )
+    contracts.insert(0, "CLIENTE", client_ids)
+
+    # Return the modified Contracts data
+    return contracts
+
+
+def netpaid_perf(windows, tables=None, how="inner"):
+    # Get the window specification, given either directly or as a day offset
+    windows = window_spec(windows)
+
+    # Get the Advisory Performance data, with the last date of each client, from the raw tables
+    advisory_performance = raw_tables(tables).derived(
+        "advisory_events", advisory_events
+    )
+
+    # Find the windows containing each advisory period, counting back from the last date
+    first, last = windows.window_range(
+        advisory_performance.LAST_DATE,
+        advisory_performance.DT_INIZIO_PERIODO,
+        advisory_performance.DT_FINE_PERIODO,
+    )
+
+    # Repeat each row once per window containing its period (a period can span a window boundary)
+    repeats = np.maximum(last - first + 1, 0)
+    rows = np.repeat(np.arange(len(advisory_performance)), repeats)
+    window = np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    window += np.repeat(first, repeats)
+    advisory_performance = advisory_performance.iloc[rows]
+
+    # Calculate the net paid and performance of every client and window with a single groupby
+    totals = advisory_performance.groupby(
+        [advisory_performance.ID_CLIENTE.to_numpy(), window]
+    )[["VERSATO_NETTO", "RENDIMENTO"]].sum()
+
+    # Spread the windows over the columns
+    columns = pd.MultiIndex.from_product(
+        [["VERSATO_NETTO", "RENDIMENTO"], range(windows.count)]
+    )
+    depos_withdr_perf = totals.unstack().reindex(columns=columns)
+
+    # Keep only the clients with advisory data in every window, or fill the missing windows with 0
+    if how == "inner":
+        depos_withdr_perf = depos_withdr_perf.dropna()
+    elif how == "outer":
+        depos_withdr_perf = depos_withdr_perf.reindex(
+            raw_tables(tables)["advisory_performance"]["ID_CLIENTE"].unique()
+        ).fillna(0)
+    else:
+        raise ValueError("how must be 'inner' or 'outer', got {!r}".format(how))
+    depos_withdr_perf.columns = windows.names("NET_PAID") + windows.names("PERFORMANCE")
+
+    # Return the net paid and performance data
+    return depos_withdr_perf.astype(float).rename_axis("ID_CLIENTE").reset_index()
+
+
+def mkt_performance(windows, tables=None):
+    # Get the Advisory Performance data, with the last date of each client, and the market index from the raw tables
+    tables = raw_tables(tables)
+    advisory_performance = tables.derived("advisory_events", advisory_events)
+    market = tables.derived("market_index", market_events)
+
+    # Create a new DataFrame to store market performance data for each client
+    mkt_performance = advisory_performance[
+        ["ID_CLIENTE", "LAST_DATE"]
+    ].drop_duplicates()
+
+    # Calculate the market performance for each client in the past months
+    mkt_performance = market_windows(mkt_performance, market, windows)
+
+    # Remove the "LAST_DATE" column from the market performance DataFrame
+    mkt_performance = mkt_performance.drop("LAST_DATE", axis=1)
+
+    # Return the market performance DataFrame
+    return mkt_performance
+
+
+def market_windows(mkt_performance, market, windows):
+    # Get the window specification, given either directly or as a day offset
+    windows = window_spec(windows)
+
+    # Get the sorted market dates and the cumulative sum index of the daily returns
+    market_dates, cumulative_returns = market
+
+    # Copy the clients DataFrame so that the input is left untouched
+    mkt_performance = mkt_performance.copy()
+
+    # Iterate over the windows to calculate the market performance for each client in the past months
+    for i, name in enumerate(windows.names("MARKET_PERFORMANCE")):
+        # Locate the window bounds of every client at once with a binary search over the market dates
+        window_start = np.searchsorted(
+            market_dates,
+            windows.start(mkt_performance.LAST_DATE, i).to_numpy(),
+            side="left",
+        )
+        window_end = np.searchsorted(
+            market_dates,
+            windows.end(mkt_performance.LAST_DATE, i).to_numpy(),
+            side="left",
+        )
+
+        # Calculate the sum of daily returns in each window and insert it into the market performance DataFrame
+        mkt_performance.insert(
+            i, name, cumulative_returns[window_end] - cumulative_returns[window_start]
+        )
+
+    # Return the market performance DataFrame
+    return mkt_performance
+
+
+def investments(windows, tables=None):
+    # Get the window specification, given either directly or as a day offset
+    windows = window_spec(windows)
+
+    # Get the daily purchases merged with the closing date of each contract from the raw tables
+    purchases, client_ids = raw_tables(tables).derived(
+        "purchase_events", purchase_events
+    )
+
+    # Find the window of each daily purchase, counting back from the closing date of the contract
+    window = windows.window_of(purchases.LAST_DATE, purchases.DATA_CONTABILE)
+    purchases = purchases[window >= 0]
+    window = window[window >= 0]
+
+    # Calculate the sum and count of investments of every client and window with a single groupby
+    totals = purchases.groupby([purchases.ID_CLIENTE.to_numpy(), window])[
+        ["sum", "count"]
+    ].sum()
+
+    # Spread the windows over the columns, with 0 for the clients without purchases in a window
+    columns = pd.MultiIndex.from_product([["sum", "count"], range(windows.count)])
+    investments = (
+        totals.unstack()
+        .reindex(index=client_ids, columns=columns)
+        .fillna(0)
+        .astype(float)
+    )
+    investments.columns = windows.names("INVESTMENTS") + windows.names(
+        "NUM_INVESTMENTS"
+    )
+
+    # Return the investments DataFrame
+    return investments.rename_axis("ID_CLIENTE").reset_index()
+
+
+def churn_labels(active_contracts):
+    # Label "CHURN" the clients without active contracts and "NO CHURN" the others
+    return pd.Series(
+        np.where(active_contracts == 0, "CHURN", "NO CHURN"),
+        index=active_contracts.index,
+    )
+
+
+def labeling(dataset):
+    # Insert the churn labels, based on the active contracts, at the beginning of the dataset
+    dataset.insert(0, "PREDICTION", churn_labels(dataset["ACTIVE_CONTRACTS_CURRENTLY"]))
+
+
+def REGRESS(data, full=False):
+    # Convert the input data to a NumPy array
+    arr = data.to_numpy(dtype=float)
+
+    # Generate the x-axis values based on the number of columns in the data
+    x_axis = np.arange(len(data.columns) - 1, -1, -1, dtype=float)
+
+    # Center the x-axis values, which are shared by every row, and each row of the data
+    x_centered = x_axis - x_axis.mean()
+    row_means = arr.mean(axis=1)
+    rows_centered = arr - row_means[:, np.newaxis]
+
+    # Compute the least-squares slope of every row at once with a single matrix-vector product
+    ss_x = x_centered @ x_centered
+    ss_xy = rows_centered @ x_centered
+    slope = ss_xy / ss_x
+
+    # Return only the slopes unless the full regression results are requested
+    if not full:
+        return pd.DataFrame({0: slope})
+
+    # Compute the intercept, correlation coefficient and slope standard error like scipy's linregress
+    intercept = row_means - slope * x_axis.mean()
+    ss_y = np.einsum("ij,ij->i", rows_centered, rows_centered)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r_value = np.clip(ss_xy / np.sqrt(ss_x * ss_y), -1.0, 1.0)
+    r_value[ss_y == 0] = 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std_err = np.sqrt((1 - r_value**2) * ss_y / ss_x / (len(x_axis) - 2))
+
+    return pd.DataFrame(
+        {
+            "slope": slope,
+            "intercept": intercept,
+            "r_value": r_value,
+            "std_err": std_err,
+        }
+    )
+
+
+# Define the feature builders of the dataset, which are independent of each other
+feature_builders = {
+    "contracts": contracts,
+    "netpaid_perf": netpaid_perf,
+    "mkt_performance": mkt_performance,
+    "investments": investments,
+}
+
+# Define the client ID column of each feature builder output
+feature_keys = {
+    "contracts": "CLIENTE",
+    "netpaid_perf": "ID_CLIENTE",
+    "mkt_performance": "ID_CLIENTE",
+    "investments": "ID_CLIENTE",
+}
+
+# Define the raw table read by each feature builder, used to count the rows of its input
+builder_inputs = {
+    "contracts": "contracts",
+    "netpaid_perf": "advisory_performance",
+    "mkt_performance": "advisory_performance",
+    "investments": "transactions",
+}
+
+# Map each index shared between the feature builders and snapshots to the function building it
+shared_indexes = {
+    "contract_events": contract_events,
+    "advisory_events": advisory_events,
+    "market_index": market_events,
+    "purchase_events": purchase_events,
+    "clients": clients,
+}
+
+
+def index_tables(tables):
+    # Read every raw table and build every shared index, so that the worker processes receive
+    # them ready instead of each reading and indexing the tables again
+    tables.load()
+    for name, build in shared_indexes.items():
+        tables.derived(name, build)
+    return tables
+
+
+# Raw tables of a worker process, set once when the process pool starts
+_worker_tables = None
+
+
+def _init_worker(tables):
+    global _worker_tables
+    _worker_tables = tables
+
+
+def _run_builder(name, windows):
+    # Run one feature builder in a worker process and send back its columns as plain arrays
+    return to_columns(feature_builders[name](windows, _worker_tables))
+
+
+def to_columns(frame):
+    # Convert a DataFrame to a compact mapping of column names to NumPy arrays
+    return {column: frame[column].to_numpy() for column in frame.columns}
+
+
+def from_columns(columns):
+    # Rebuild a DataFrame from a mapping of column names to NumPy arrays
+    return pd.DataFrame(columns, columns=list(columns))
+
+
+def build_features(windows, tables):
+    # Run every feature builder one after another, measuring each of them when profiling
+    features = {}
+    for name, builder in feature_builders.items():
+        with stage(name, rows_in=len(tables[builder_inputs[name]])) as measured:
+            features[name] = builder(windows, tables)
+            measured.output(features[name])
+    return features
+
+
+def iter_features(windows_list, tables, workers):
+    # Run every feature builder for every window specification on a process pool, loading and
+    # indexing the raw tables in this process first
+    tables = index_tables(tables)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(tables,)
+    ) as pool:
+        futures = {
+            pool.submit(_run_builder, name, windows): (i, name)
+            for i, windows in enumerate(windows_list)
+            for name in feature_builders
+        }
+
+        # Yield the features of each window specification once all of its builders are done
+        features = {}
+        for future in as_completed(futures):
+            i, name = futures[future]
+            features.setdefault(i, {})[name] = from_columns(future.result())
+            if len(features[i]) == len(feature_builders):
+                yield windows_list[i], features.pop(i)
+
+
+def create_dataset(windows, tables=None, workers=None, keep_id=False):
+    # Get the window specification, given either directly or as a day offset
+    windows = window_spec(windows)
+
+    # Read each raw table once and share the parsed frames between the feature builders
+    tables = raw_tables(tables)
+
+    # Run the feature builders, on a process pool if a number of workers is given
+    if workers:
+        ((windows, features),) = iter_features([windows], tables, workers)
+    else:
+        features = build_features(windows, tables)
+
+    # Join the features into the dataset
+    return assemble_dataset(windows, tables, features, keep_id)
+
+
+def _aligned(frame, rows, columns, index):
+    # Select the given rows and columns of a feature block and label the rows with the shared index
+    block = frame.iloc[rows, columns]
+    block.index = index
+    return block
+
+
+def assemble_dataset(windows, tables, features, keep_id=False):
+    # Obtain the clients data from the 'clients' function, shared between snapshots
+    with stage("clients", rows_in=len(tables["clients"])) as measured:
+        clients_data = tables.derived("clients", clients)
+        measured.output(clients_data)
+
+    # Find the row of every client in each feature block, keeping only the clients present in all
+    # of them, like inner merges on the client ID
+    rows = {
+        name: pd.Index(frame[feature_keys[name]]).get_indexer(
+            clients_data["ID_CLIENTE"]
+        )
+        for name, frame in features.items()
+    }
+    present = np.logical_and.reduce([row >= 0 for row in rows.values()])
+    index = pd.RangeIndex(int(present.sum()))
+
+    # Align the clients data and every feature block, without its client ID, on the kept clients
+    blocks = {"clients": _aligned(clients_data, present, slice(None), index)}
+    for name, frame in features.items():
+        blocks[name] = _aligned(
+            frame, rows[name][present], frame.columns != feature_keys[name], index
+        )
+
+    # Calculate the relative performance of each window, the performance minus the market performance
+    blocks["relative_performance"] = pd.DataFrame(
+        blocks["netpaid_perf"][windows.names("PERFORMANCE")].to_numpy(float)
+        - blocks["mkt_performance"][windows.names("MARKET_PERFORMANCE")].to_numpy(
+            float
+        ),
+        columns=windows.names("RELATIVE_PERFORMANCE"),
+        index=index,
+    )
+
+    # Define the windowed features to regress, with the columns of every window but the most recent one
+    regressions = [
+        (
+            "REGRESS_ACTIVE_CONTRACTS",
+            "contracts",
+            windows.names_before("ACTIVE_CONTRACTS")[1:],
+        ),
+        (
+            "REGRESS_CLOSED_CONTRACTS",
+            "contracts",
+            windows.names_before("CLOSED_CONTRACTS")[1:],
+        ),
+        ("REGRESS_NET_PAID", "netpaid_perf", windows.names("NET_PAID")[1:]),
+        ("REGRESS_PERFORMANCE", "netpaid_perf", windows.names("PERFORMANCE")[1:]),
+        (
+            "REGRESS_RELATIVE_PERFORMANCE",
+            "relative_performance",
+            windows.names("RELATIVE_PERFORMANCE")[1:],
+        ),
+        ("REGRESS_INVESTMENTS", "investments", windows.names("INVESTMENTS")[1:]),
+    ]
+
+    # Calculate the regression slopes for active contracts, closed contracts, net paid, performance, relative performance, and investments
+    with stage("REGRESS", rows_in=len(index)) as measured:
+        blocks["regress"] = pd.DataFrame(
+            {
+                name: REGRESS(blocks[block][columns])[0].to_numpy()
+                for name, block, columns in regressions
+            },
+            columns=[name for name, _, _ in regressions],
+            index=index,
+        )
+        measured.output(blocks["regress"])
+
+    # Label churn and non-churn based on the active contracts
+    with stage("labeling", rows_in=len(index)) as measured:
+        blocks["label"] = churn_labels(
+            blocks["contracts"]["ACTIVE_CONTRACTS_CURRENTLY"]
+        ).to_frame("PREDICTION")
+        measured.output(blocks["label"])
+
+    # Order the columns like the merged clients, contracts, net paid and performance, relative
+    # performance and investments data, with the label first and the REGRESS_* columns at position 6
+    merged = [
+        (name, column)
+        for name in [
+            "clients",
+            "contracts",
+            "netpaid_perf",
+            "relative_performance",
+            "investments",
+        ]
+        for column in blocks[name].columns
+    ]
+    ordered = (
+        [("label", "PREDICTION")]
+        + merged[:6]
+        + [("regress", column) for column in blocks["regress"].columns]
+        + merged[6:]
+    )
+
+    # Leave out the most recent window of each feature and, unless it is asked to be kept, the client ID
+    unused = ([] if keep_id else ["ID_CLIENTE"]) + [
+        "ACTIVE_CONTRACTS_CURRENTLY",
+        "CLOSED_CONTRACTS_CURRENTLY",
+        windows.names_before("ACTIVE_CONTRACTS")[0],
+        windows.names_before("CLOSED_CONTRACTS")[0],
+        windows.names("NET_PAID")[0],
+        windows.names("PERFORMANCE")[0],
+        windows.names("RELATIVE_PERFORMANCE")[0],
+        windows.names("INVESTMENTS")[0],
+        windows.names("NUM_INVESTMENTS")[0],
+    ]
+    ordered = [(name, column) for name, column in ordered if column not in unused]
+
+    # Concatenate the consecutive columns of each block at once into the dataset
+    pieces = [
+        blocks[name][[column for _, column in group]]
+        for name, group in groupby(ordered, key=itemgetter(0))
+    ]
+    return pd.concat(pieces, axis=1)
+
+
+def iter_datasets(offsets, windows=None, tables=None, workers=None, keep_id=False):
+    # Get the window specification shared by all snapshots, the default one if not given
+    windows = window_spec(0 if windows is None else windows)
+
+    # Read and index the raw tables once, sharing them between all snapshots
+    tables = raw_tables(tables)
+
+    # Create the dataset of each day offset, yielding each snapshot as soon as it completes
+    if workers:
+        # Run the builders of all day offsets on a process pool, so snapshots complete in any order
+        windows_list = [windows._replace(offset=offset) for offset in offsets]
+        for snapshot, features in iter_features(windows_list, tables, workers):
+            yield snapshot.offset, assemble_dataset(snapshot, tables, features, keep_id)
+    else:
+        for offset in offsets:
+            yield offset, create_dataset(
+                windows._replace(offset=offset), tables, keep_id=keep_id
+            )
+
+
+def create_datasets(
+    offsets,
+    windows=None,
+    tables=None,
+    output=None,
+    workers=None,
+    output_format="feather",
+    keep_id=False,
+):
+    # Create the datasets of all day offsets in one pass over the indexed raw tables
+    datasets = {}
+    for offset, dataset in iter_datasets(offsets, windows, tables, workers, keep_id):
+        if output is None:
+            datasets[offset] = dataset
+        else:
+            # Write each snapshot as it completes, e.g. to "data/clients_dataset_{offset}.feather",
+            # and keep only its path
+            datasets[offset] = output.format(offset=offset)
+            save_dataset(dataset, datasets[offset], output_format)
+    return datasets
+
+
+def profile_dataset(windows, tables=None, report=None, cprofile=(), cprofile_dir=None):
+    # Build a dataset in this process, measuring the time, memory and rows of every stage
+    with profiled(cprofile, cprofile_dir) as profile:
+        # Read the raw tables first, so that the feature builders are measured on parsed data
+        tables = raw_tables(tables)
+        with stage("raw_tables") as measured:
+            tables.load()
+            measured.record["rows_out"] = sum(len(tables[name]) for name in TABLES)
+        dataset = create_dataset(windows, tables)
+
+    # Write the JSON report, e.g. to "data/profile.json", if a path is given
+    if report is not None:
+        profile.write(report)
+    return dataset, profile.report()
+
+
+# Define the file formats the dataset can be saved to, with their file extension
+OUTPUT_FORMATS = {"feather": ".feather", "pickle": ".pickle", "csv": ".csv"}
+
+
+def save_dataset(dataset, path, output_format="feather"):
+    if output_format == "feather":
+        # Save the dataset to the typed, memory-mappable feature store
+        write_features(dataset, path)
+    elif output_format == "pickle":
+        # Save the dataset as a pickled DataFrame, the format of the first versions of the pipeline
+        dataset.to_pickle(path)
+    elif output_format == "csv":
+        dataset.to_csv(path, index=False)
+    else:
+        raise ValueError(
+            "output_format must be one of {}, got {!r}".format(
+                ", ".join(OUTPUT_FORMATS), output_format
+            )
+        )
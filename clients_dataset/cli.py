@@ -0,0 +1,96 @@
+"""Command line entry point of the dataset build.
+
+Run from the repository root:
+
+    python -m clients_dataset --data-dir data --offsets 0 28 56 --workers 4
+"""
+
+import argparse
+import os
+
+from . import build
+from .raw_tables import RawTables
+
+
+def output_template(data_dir, offsets, output_format):
+    # Name the output after the data directory, with one file per day offset if there are several
+    extension = build.OUTPUT_FORMATS[output_format]
+    if len(offsets) == 1:
+        return os.path.join(data_dir, "clients_dataset" + extension)
+    return os.path.join(data_dir, "clients_dataset_{offset}" + extension)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m clients_dataset", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument(
+        "--data-dir", default=build.data_dir, help="directory of the raw CSV tables"
+    )
+    parser.add_argument(
+        "--offsets",
+        type=int,
+        nargs="+",
+        default=[0],
+        help="day offsets of the snapshots to build (default: 0)",
+    )
+    parser.add_argument(
+        "--output",
+        help="output path, with '{offset}' replaced by the day offset of each snapshot "
+        "(default: DATA_DIR/clients_dataset[_{offset}].EXT)",
+    )
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=sorted(build.OUTPUT_FORMATS),
+        default="feather",
+        help="output file format (default: feather)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes running the feature builders (default: none)",
+    )
+    parser.add_argument(
+        "--keep-id",
+        action="store_true",
+        help="keep the ID_CLIENTE column, e.g. to score the clients with "
+        "churn_models.batch_scoring",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="directory of the parsed table cache (default: DATA_DIR/cache)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="parse the CSV tables on every run"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Read the raw tables of the given directory, through the parsed table cache unless disabled
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or os.path.join(args.data_dir, "cache")
+    tables = RawTables(args.data_dir, cache_dir)
+
+    # Build and write every snapshot, printing the path of each one
+    output = args.output or output_template(
+        args.data_dir, args.offsets, args.output_format
+    )
+    if len(args.offsets) > 1 and "{offset}" not in output:
+        raise SystemExit(
+            "--output must contain '{offset}' when building several offsets"
+        )
+    paths = build.create_datasets(
+        args.offsets,
+        tables=tables,
+        output=output,
+        workers=args.workers,
+        output_format=args.output_format,
+        keep_id=args.keep_id,
+    )
+    for offset in args.offsets:
+        print(paths[offset])
@@ -0,0 +1,84 @@
+"""Typed, memory-mappable columnar store for the clients dataset.
+
+The dataset is written as an uncompressed Arrow IPC (Feather) file with
+compact dtypes: the smallest integer type for counts and other integer
+features, float32 for the real-valued features and a categorical
+``PREDICTION`` label. Readers memory-map the file and load only the columns
+and row ranges they ask for.
+"""
+
+import pandas as pd
+
+# Define the labels of the "PREDICTION" column
+LABELS = ["CHURN", "NO CHURN"]
+
+# Define the prefixes of the count features, stored as integers
+COUNT_PREFIXES = ("ACTIVE_CONTRACTS_", "CLOSED_CONTRACTS_", "NUM_INVESTMENTS_")
+
+
+def compact(dataset, float_dtype="float32"):
+    # Convert every column of the dataset to its most compact dtype
+    columns = {}
+    for name, column in dataset.items():
+        if name == "PREDICTION":
+            column = column.astype(pd.CategoricalDtype(LABELS))
+        elif column.dtype == bool:
+            pass
+        elif name.startswith(COUNT_PREFIXES) or pd.api.types.is_integer_dtype(column):
+            column = pd.to_numeric(column.astype("int64"), downcast="integer")
+        elif pd.api.types.is_float_dtype(column):
+            column = column.astype(float_dtype)
+        columns[name] = column
+    return pd.DataFrame(columns).reset_index(drop=True)
+
+
+def write_features(dataset, path, float_dtype="float32", chunksize=65536):
+    # Write the compacted dataset to an uncompressed file that can be memory-mapped
+    import pyarrow as pa
+    from pyarrow import feather
+
+    table = pa.Table.from_pandas(compact(dataset, float_dtype), preserve_index=False)
+    feather.write_feather(table, path, compression="uncompressed", chunksize=chunksize)
+
+
+class FeatureStore:
+    """Memory-mapped view of a dataset written by ``write_features``."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+
+        self.path = path
+        self._table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+    @property
+    def columns(self):
+        return self._table.column_names
+
+    def __len__(self):
+        return self._table.num_rows
+
+    def read(self, columns=None, start=0, stop=None):
+        # Read the given columns, all by default, for the rows in [start, stop)
+        stop = len(self) if stop is None else min(stop, len(self))
+        table = self._table.slice(start, max(stop - start, 0))
+        if columns is not None:
+            table = pa_table(table, columns)
+
+        # Number the rows by their position in the whole dataset
+        frame = table.to_pandas()
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        return frame
+
+
+def pa_table(table, columns):
+    # Select columns of an Arrow table without copying them
+    import pyarrow as pa
+
+    return pa.Table.from_arrays(
+        [table.column(name) for name in columns], names=list(columns)
+    )
+
+
+def read_features(path, columns=None, start=0, stop=None):
+    # Read the given columns and row range of a dataset written by 'write_features'
+    return FeatureStore(path).read(columns, start, stop)
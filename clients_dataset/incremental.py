@@ -0,0 +1,273 @@
+"""Incremental daily refresh of the clients dataset.
+
+Transactions.csv and AdvisoryPerformance.csv only grow by appended rows. The
+refresh keeps a per-client aggregate state between runs and applies only the
+appended (delta) rows:
+
+* the investment window sums and counts are additive, so the delta rows are
+  aggregated with the ``investments`` builder and added to the stored sums;
+* the net paid, performance and market windows depend on the last advisory
+  date of each client, so they are rebuilt for the touched clients only, from
+  a per-client trailing buffer of the advisory rows that can still fall in a
+  window;
+* the contract counts are kept as they are.
+
+The dataset rows, including the REGRESS_* slopes and the label, are then
+reassembled for the touched clients only. Any change to Clients.csv,
+Contracts.csv or MarketPerformance.csv, or a rewrite of an appended file,
+falls back to a full rebuild.
+"""
+
+import hashlib
+import io
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from . import build
+from .feature_store import write_features
+from .raw_tables import TABLES, RawTables
+from .table_cache import fingerprint, write_pickle
+from .windows import window_spec
+
+# Bump when the layout of the saved state changes
+STATE_VERSION = 1
+
+# Define the tables that only grow by appended rows, and the ones that must stay unchanged
+APPENDED_TABLES = ["advisory_performance", "transactions"]
+STATIC_TABLES = ["clients", "contracts", "market_performance"]
+
+# Number of bytes before the consumed end of an appended file used to detect a rewrite
+TAIL_BYTES = 4096
+
+
+def _path(data_dir, name):
+    return os.path.join(data_dir, TABLES[name][0])
+
+
+def _tail_hash(path, end):
+    # Hash the bytes right before the consumed end of a file
+    with open(path, "rb") as handle:
+        handle.seek(max(end - TAIL_BYTES, 0))
+        return hashlib.sha256(handle.read(end - max(end - TAIL_BYTES, 0))).hexdigest()
+
+
+def _unchanged(path, recorded):
+    # Compare size and modification time first, and the content hash only if they differ
+    current = fingerprint(path, content_hash=False)
+    if all(recorded[key] == current[key] for key in current):
+        return True
+    return fingerprint(path)["sha256"] == recorded["sha256"]
+
+
+def read_appended(path, reader, end):
+    # Read the complete lines appended after byte 'end', parsed with the table reader
+    with open(path, "rb") as handle:
+        header = handle.readline()
+        handle.seek(end)
+        data = handle.read()
+    data = data[: data.rfind(b"\n") + 1]
+    return reader(io.BytesIO(header + data)), end + len(data)
+
+
+def prune_advisory(advisory_performance, last_date, windows):
+    # Keep only the rows that can still fall in a window, as the last date of a client never
+    # decreases, plus the row that defines the last date (aligned with reindex, as map turns an
+    # empty datetime Series into floats)
+    last_date = last_date.reindex(advisory_performance["ID_CLIENTE"]).to_numpy()
+    horizon = last_date - np.timedelta64(int(windows.days[-1]), "D")
+    keep = (advisory_performance["DT_INIZIO_PERIODO"].to_numpy() >= horizon) | (
+        advisory_performance["DT_FINE_PERIODO"].to_numpy() == last_date
+    )
+    return advisory_performance[keep].reset_index(drop=True)
+
+
+def _keyed(features):
+    # Index every feature builder output by client ID
+    return {
+        name: frame.set_index(build.feature_keys[name])
+        for name, frame in features.items()
+    }
+
+
+def _subset(keyed_features, client_ids):
+    # Select the feature rows of the given clients, in the layout of the feature builder outputs
+    return {
+        name: frame[frame.index.isin(client_ids)].reset_index()
+        for name, frame in keyed_features.items()
+    }
+
+
+def _replace_rows(frame, client_ids, rows):
+    # Replace the rows of the given clients in a frame indexed by client ID
+    return pd.concat([frame.drop(client_ids, errors="ignore"), rows])
+
+
+def build_state(data_dir, windows):
+    # Build the whole dataset from scratch and keep the state needed by later refreshes
+    tables = RawTables(data_dir).load()
+    features = build.build_features(windows, tables)
+    dataset = build.assemble_dataset(windows, tables, features, keep_id=True)
+
+    advisory_performance = tables["advisory_performance"]
+    last_date = advisory_performance.groupby("ID_CLIENTE")["DT_FINE_PERIODO"].max()
+
+    consumed = {}
+    for name in APPENDED_TABLES:
+        path = _path(data_dir, name)
+        end = os.path.getsize(path)
+        consumed[name] = {"end": end, "tail": _tail_hash(path, end)}
+
+    return {
+        "version": STATE_VERSION,
+        "windows": windows,
+        "static": {name: fingerprint(_path(data_dir, name)) for name in STATIC_TABLES},
+        "consumed": consumed,
+        "clients": tables["clients"],
+        "contracts": tables["contracts"],
+        "market_performance": tables["market_performance"],
+        "advisory_performance": prune_advisory(
+            advisory_performance, last_date, windows
+        ),
+        "last_date": last_date,
+        "features": _keyed(features),
+        "dataset": dataset.set_index("ID_CLIENTE"),
+    }
+
+
+def _can_refresh(state, data_dir, windows):
+    # Check that the state matches the window specification and that only appends happened
+    if state is None or state["version"] != STATE_VERSION:
+        return False
+    if state["windows"] != windows:
+        return False
+    for name in STATIC_TABLES:
+        if not _unchanged(_path(data_dir, name), state["static"][name]):
+            return False
+    for name in APPENDED_TABLES:
+        path = _path(data_dir, name)
+        consumed = state["consumed"][name]
+        if os.path.getsize(path) < consumed["end"]:
+            return False
+        if _tail_hash(path, consumed["end"]) != consumed["tail"]:
+            return False
+    return True
+
+
+def apply_delta(state, data_dir):
+    # Read the rows appended since the last refresh
+    delta = {}
+    for name in APPENDED_TABLES:
+        consumed = state["consumed"][name]
+        path = _path(data_dir, name)
+        delta[name], end = read_appended(path, TABLES[name][1], consumed["end"])
+        consumed["end"], consumed["tail"] = end, _tail_hash(path, end)
+
+    windows = state["windows"]
+    features = state["features"]
+
+    # Add the investment window sums and counts of the appended transactions to the stored ones
+    delta_investments = build.investments(
+        windows,
+        RawTables(
+            data_dir,
+            frames={
+                "transactions": delta["transactions"],
+                "contracts": state["contracts"],
+            },
+        ),
+    ).set_index("ID_CLIENTE")
+    investments = features["investments"]
+    known = delta_investments.index.intersection(investments.index)
+    updated = investments.loc[known] + delta_investments.loc[known]
+    new = delta_investments.drop(known)
+    features["investments"] = _replace_rows(
+        investments, delta_investments.index, pd.concat([updated, new])
+    )
+
+    # Append the new advisory rows and update the last date of their clients
+    advisory_clients = pd.Index(delta["advisory_performance"]["ID_CLIENTE"].unique())
+    advisory_performance = pd.concat(
+        [state["advisory_performance"], delta["advisory_performance"]],
+        ignore_index=True,
+    )
+    touched_rows = advisory_performance["ID_CLIENTE"].isin(advisory_clients)
+    touched_advisory = advisory_performance[touched_rows]
+    last_date = touched_advisory.groupby("ID_CLIENTE")["DT_FINE_PERIODO"].max()
+    state["last_date"] = pd.concat(
+        [state["last_date"].drop(advisory_clients, errors="ignore"), last_date]
+    )
+    touched_advisory = prune_advisory(touched_advisory, last_date, windows)
+    state["advisory_performance"] = pd.concat(
+        [advisory_performance[~touched_rows], touched_advisory], ignore_index=True
+    )
+
+    # Rebuild the net paid, performance and market windows of the clients with new advisory rows,
+    # if any (e.g. not on a day when only transactions were appended)
+    if len(advisory_clients):
+        advisory_tables = RawTables(
+            data_dir,
+            frames={
+                "advisory_performance": touched_advisory,
+                "market_performance": state["market_performance"],
+            },
+        )
+        for name in ["netpaid_perf", "mkt_performance"]:
+            rows = build.feature_builders[name](windows, advisory_tables)
+            features[name] = _replace_rows(
+                features[name],
+                advisory_clients,
+                rows.set_index(build.feature_keys[name]),
+            )
+
+    # Reassemble the dataset rows, REGRESS_* slopes and labels of the touched clients only
+    touched = advisory_clients.union(delta_investments.index)
+    clients = state["clients"]
+    rows = build.assemble_dataset(
+        windows,
+        RawTables(
+            data_dir, frames={"clients": clients[clients.ID_CLIENTE.isin(touched)]}
+        ),
+        _subset(features, touched),
+        keep_id=True,
+    )
+    dataset = _replace_rows(state["dataset"], touched, rows.set_index("ID_CLIENTE"))
+
+    # Keep the clients in the order of the Clients data
+    position = pd.Series(np.arange(len(clients)), index=clients["ID_CLIENTE"])
+    position = position[~position.index.duplicated()]
+    state["dataset"] = dataset.iloc[
+        np.argsort(position.loc[dataset.index].to_numpy(), kind="mergesort")
+    ]
+    return touched
+
+
+def refresh(data_dir=None, state_path=None, windows=0, output=None):
+    # Get the raw data directory and the state file, the ones of the in-memory pipeline if not given
+    data_dir = data_dir or build.data_dir
+    state_path = state_path or os.path.join(data_dir, "incremental_state.pickle")
+    windows = window_spec(windows)
+
+    # Load the state of the previous run, if any
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path, "rb") as handle:
+            state = pickle.load(handle)
+
+    # Apply only the appended rows when possible, otherwise rebuild everything
+    if _can_refresh(state, data_dir, windows):
+        touched = apply_delta(state, data_dir)
+    else:
+        state = build_state(data_dir, windows)
+        touched = state["dataset"].index
+
+    # Save the state for the next run
+    write_pickle(state_path, state)
+
+    # Return the dataset without the client ID, like the full build, and write it if asked
+    dataset = state["dataset"].reset_index(drop=True)
+    if output is not None:
+        write_features(dataset, output)
+    return dataset, touched
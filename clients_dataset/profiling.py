@@ -0,0 +1,200 @@
+"""Stage-level timing and memory instrumentation of the dataset build."""
+
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Profile of the running build, if any
+_active = None
+
+
+def peak_rss(children=False):
+    # Get the peak resident set size of the process, or of its largest terminated child process,
+    # in bytes, or None if it is not available
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def current_rss():
+    # Get the current resident set size of the process in bytes, or None if it is not available
+    # (only Linux exposes it without a dependency)
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """Sample the resident set size on a background thread, keeping its maximum.
+
+    Allocations freed within less than ``interval`` seconds may be missed.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = current_rss()
+        self.peak = self.start
+        self._stopped = threading.Event()
+        self._thread = None
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        # Stop sampling and get the peak increase over the RSS at start in bytes, or None
+        if self._thread is None:
+            return None
+        self._stopped.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak - self.start
+
+
+def memory_footprint(frame):
+    # Get the memory used by a DataFrame or Series, including the Python objects it holds
+    return int(np.sum(frame.memory_usage(deep=True)))
+
+
+class Stage:
+    """Measurements of one stage, recorded by the profile it belongs to."""
+
+    def __init__(self, profile, name, rows_in=None):
+        self.profile = profile
+        self.record = {"stage": name, "rows_in": rows_in}
+
+    def output(self, frame):
+        # Record the rows and memory footprint of the stage output
+        if self.profile is not None:
+            self.record["rows_out"] = len(frame)
+            self.record["memory_bytes"] = memory_footprint(frame)
+
+
+class BuildProfile:
+    """Wall time, CPU time, RSS, rows and memory of each stage of a build.
+
+    The RSS of a stage is recorded at its entry, with its peak increase during
+    the stage, sampled on a background thread. The peak RSS of the report is
+    the high-water mark of the whole process.
+
+    ``cprofile`` names the stages to run under cProfile (``"*"`` for all of
+    them). Their statistics are written to ``cprofile_dir`` if given, and the
+    functions with the largest cumulative time are kept in the report.
+    """
+
+    def __init__(self, cprofile=(), cprofile_dir=None, top=20):
+        self.cprofile = set(cprofile)
+        self.cprofile_dir = cprofile_dir
+        self.top = top
+        self.stages = []
+        self.started = None
+        self.finished = None
+
+    def _profiles(self, name):
+        return "*" in self.cprofile or name in self.cprofile
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None):
+        stage = Stage(self, name, rows_in)
+        profiler = cProfile.Profile() if self._profiles(name) else None
+        sampler = RssSampler()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield stage
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stage.record["wall_seconds"] = time.perf_counter() - wall
+            stage.record["cpu_seconds"] = time.process_time() - cpu
+            stage.record["rss_start_bytes"] = sampler.start
+            stage.record["rss_peak_increase_bytes"] = sampler.stop()
+            if profiler is not None:
+                stage.record["cprofile"] = self._cprofile_report(
+                    profiler, len(self.stages), name
+                )
+            self.stages.append(stage.record)
+
+    def _cprofile_report(self, profiler, index, name):
+        # Write the cProfile statistics of a stage, if asked, and keep its slowest functions
+        report = {}
+        if self.cprofile_dir is not None:
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+            report["path"] = os.path.join(
+                self.cprofile_dir, "{:02d}_{}.prof".format(index, name)
+            )
+            profiler.dump_stats(report["path"])
+        profiler.create_stats()
+        functions = sorted(
+            profiler.stats.items(), key=lambda item: item[1][3], reverse=True
+        )
+        report["top"] = [
+            {
+                "function": "{}:{}({})".format(*function),
+                "calls": calls,
+                "total_seconds": total,
+                "cumulative_seconds": cumulative,
+            }
+            for function, (_, calls, total, cumulative, _) in functions[: self.top]
+        ]
+        return report
+
+    def report(self):
+        # Collect the stage measurements and the environment of the build
+        return {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "wall_seconds": (self.finished or time.time()) - self.started,
+            "peak_rss_bytes": peak_rss(),
+            "stages": self.stages,
+        }
+
+    def write(self, path):
+        # Write the report as JSON
+        with open(path, "w") as handle:
+            json.dump(self.report(), handle, indent=2)
+
+
+@contextlib.contextmanager
+def profiled(cprofile=(), cprofile_dir=None):
+    # Record the stages run inside the block, e.g. "with profiled() as profile: ..."
+    global _active
+    previous, _active = _active, BuildProfile(cprofile, cprofile_dir)
+    _active.started = time.time()
+    try:
+        yield _active
+    finally:
+        _active.finished = time.time()
+        _active = previous
+
+
+@contextlib.contextmanager
+def stage(name, rows_in=None):
+    # Measure a stage of the running profile, or do nothing if no profile is running
+    if _active is None:
+        yield Stage(None, name, rows_in)
+    else:
+        with _active.stage(name, rows_in) as measured:
+            yield measured
@@ -0,0 +1,152 @@
+"""Load the raw CSV tables once and share the parsed frames between builders."""
+
+import pandas as pd
+
+from .table_cache import cached_read
+
+# Define the dates used when a contract has no opening or closing date
+DEFAULT_OPENING_DATE = "1999-11-29"
+DEFAULT_CLOSING_DATE = "2019-11-29"
+
+
+def read_clients(path):
+    # Read the Clients data, storing the "PSC" profile as a categorical column
+    return pd.read_csv(path, sep="\t", dtype={"PSC": "category"})
+
+
+def read_contracts(path):
+    # Read only the Contracts columns used by the feature builders
+    contracts = pd.read_csv(
+        path,
+        sep="\t",
+        usecols=["ID", "CLIENTE", "STATO", "DATA_APERTURA", "DATA_CHIUSURA"],
+        dtype={
+            "ID": "int64",
+            "CLIENTE": "int64",
+            "STATO": "int8",
+            "DATA_APERTURA": "object",
+            "DATA_CHIUSURA": "object",
+        },
+    )
+
+    # Replace "(null)" dates with the default dates and convert them to datetime format
+    contracts["DATA_CHIUSURA"] = pd.to_datetime(
+        contracts["DATA_CHIUSURA"].replace({"(null)": DEFAULT_CLOSING_DATE})
+    )
+    contracts["DATA_APERTURA"] = pd.to_datetime(
+        contracts["DATA_APERTURA"].replace({"(null)": DEFAULT_OPENING_DATE})
+    )
+    return contracts
+
+
+def read_advisory_performance(path):
+    # Read the Advisory Performance data and convert the period bounds to datetime format
+    advisory_performance = pd.read_csv(
+        path,
+        sep="\t",
+        usecols=[
+            "ID_CLIENTE",
+            "DT_INIZIO_PERIODO",
+            "DT_FINE_PERIODO",
+            "VERSATO_NETTO",
+            "RENDIMENTO",
+        ],
+        dtype={"ID_CLIENTE": "int64", "VERSATO_NETTO": float, "RENDIMENTO": float},
+    )
+    advisory_performance["DT_INIZIO_PERIODO"] = pd.to_datetime(
+        advisory_performance.DT_INIZIO_PERIODO
+    )
+    advisory_performance["DT_FINE_PERIODO"] = pd.to_datetime(
+        advisory_performance.DT_FINE_PERIODO
+    )
+    return advisory_performance
+
+
+def read_market_performance(path):
+    # Read the Market Performance data and convert the dates to datetime format
+    market_performance = pd.read_csv(
+        path,
+        sep="\t",
+        usecols=["DATA", "REND_GIORN"],
+        dtype={"REND_GIORN": float},
+    )
+    market_performance["DATA"] = pd.to_datetime(market_performance.DATA)
+    return market_performance
+
+
+def read_transactions(path):
+    # Read only the Transactions columns used by the feature builders
+    transactions = pd.read_csv(
+        path,
+        sep=",",
+        usecols=["ID_CONTRATTO", "ID_CLIENTE", "DATA_CONTABILE", "NOME", "IMP_LORDO"],
+        dtype={
+            "ID_CONTRATTO": "int64",
+            "ID_CLIENTE": "int64",
+            "NOME": "category",
+            "IMP_LORDO": float,
+        },
+    )
+    transactions["DATA_CONTABILE"] = pd.to_datetime(transactions.DATA_CONTABILE)
+    return transactions
+
+
+# Map each table name to its source file and reader
+TABLES = {
+    "clients": ("Clients.csv", read_clients),
+    "contracts": ("Contracts.csv", read_contracts),
+    "advisory_performance": ("AdvisoryPerformance.csv", read_advisory_performance),
+    "market_performance": ("MarketPerformance.csv", read_market_performance),
+    "transactions": ("Transactions.csv", read_transactions),
+}
+
+# Map each table name to the field separator of its source file
+SEPARATORS = {
+    "clients": "\t",
+    "contracts": "\t",
+    "advisory_performance": "\t",
+    "market_performance": "\t",
+    "transactions": ",",
+}
+
+
+class RawTables:
+    """Lazily read each raw table of a data directory, at most once.
+
+    The parsed frames are shared by every feature builder, which must treat
+    them as read-only. When ``cache_dir`` is given, the cleaned tables are
+    also kept in a persistent columnar cache (see ``table_cache``). Indexes
+    derived from the tables, such as the sorted per-client event arrays, are
+    built once through ``derived`` and shared the same way. Already parsed
+    frames, e.g. a table shared by several data directories, can be passed
+    as ``frames`` to be used instead of reading their files.
+    """
+
+    def __init__(self, data_dir, cache_dir=None, frames=None):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self._frames = dict(frames or {})
+        self._derived = {}
+
+    def __getitem__(self, name):
+        # Read the table on first access and keep the parsed frame for later builders
+        if name not in self._frames:
+            file_name, reader = TABLES[name]
+            path = self.data_dir + "/" + file_name
+            if self.cache_dir is None:
+                self._frames[name] = reader(path)
+            else:
+                self._frames[name] = cached_read(path, reader, self.cache_dir, name)
+        return self._frames[name]
+
+    def derived(self, name, build):
+        # Build an index of the raw tables on first access and share it, e.g. between snapshots
+        if name not in self._derived:
+            self._derived[name] = build(self)
+        return self._derived[name]
+
+    def load(self):
+        # Read every table that has not been read yet
+        for name in TABLES:
+            self[name]
+        return self
@@ -0,0 +1,146 @@
+"""Client-sharded streaming build for raw data larger than memory.
+
+The raw files are read in chunks and their rows are partitioned by a hash of
+the client ID into on-disk shards. Every feature is computed per client, so
+each shard is built on its own with the in-memory pipeline and the results
+are concatenated. Only the chunk being partitioned and one shard are held in
+memory at a time.
+"""
+
+import math
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from . import build
+from .raw_tables import SEPARATORS, TABLES, RawTables, read_clients
+
+# Map each table partitioned into shards to its client ID column. The market
+# series is shared by all clients and is loaded once instead.
+SHARD_KEYS = {
+    "clients": "ID_CLIENTE",
+    "contracts": "CLIENTE",
+    "advisory_performance": "ID_CLIENTE",
+    "transactions": "ID_CLIENTE",
+}
+
+# Estimated ratio between the memory used to build a shard and its size on disk
+MEMORY_PER_FILE_BYTE = 4
+
+
+def shard_count(data_dir, memory_limit):
+    # Choose enough shards for the estimated build memory of one shard to fit in the limit (in bytes)
+    total_size = sum(
+        os.path.getsize(os.path.join(data_dir, TABLES[name][0])) for name in SHARD_KEYS
+    )
+    return max(1, math.ceil(total_size * MEMORY_PER_FILE_BYTE / memory_limit))
+
+
+def shard_of(client_ids, shards):
+    # Assign each client ID to a shard with a stable hash, identical for every table
+    return pd.util.hash_array(np.asarray(client_ids, dtype="int64")) % shards
+
+
+def psc_categories(path, chunksize=100000):
+    # Collect the "PSC" categories of the whole Clients data, with the NA handling of read_clients
+    categories = set()
+    for chunk in pd.read_csv(
+        path, sep="\t", usecols=["PSC"], dtype={"PSC": "category"}, chunksize=chunksize
+    ):
+        categories.update(chunk["PSC"].cat.categories)
+    return sorted(categories)
+
+
+def partition(data_dir, shard_dir, shards, chunksize=100000):
+    # Record the client order of the whole Clients data
+    client_order = []
+
+    for name, key in SHARD_KEYS.items():
+        file_name = TABLES[name][0]
+        sep = SEPARATORS[name]
+        shard_paths = [
+            os.path.join(shard_dir, "shard_{:04d}".format(shard), file_name)
+            for shard in range(shards)
+        ]
+
+        # Read the raw text in chunks, without parsing, so that every shard file is a subset of the source rows
+        chunks = pd.read_csv(
+            os.path.join(data_dir, file_name),
+            sep=sep,
+            dtype=str,
+            na_filter=False,
+            chunksize=chunksize,
+        )
+        for number, chunk in enumerate(chunks):
+            if number == 0:
+                # Write the header of every shard file, so that empty shards still have the table
+                for path in shard_paths:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    chunk.iloc[:0].to_csv(path, sep=sep, index=False)
+
+            if name == "clients":
+                client_order.append(chunk[key].astype("int64").to_numpy())
+
+            # Append the rows of each shard to its file
+            for shard, rows in chunk.groupby(shard_of(chunk[key], shards)):
+                rows.to_csv(
+                    shard_paths[shard], sep=sep, index=False, header=False, mode="a"
+                )
+
+    clients_path = os.path.join(data_dir, TABLES["clients"][0])
+    return np.concatenate(client_order), psc_categories(clients_path, chunksize)
+
+
+def create_dataset(
+    windows,
+    data_dir=None,
+    shards=None,
+    memory_limit=2 * 1024**3,
+    chunksize=100000,
+    shard_dir=None,
+):
+    # Get the raw data directory, the one of the in-memory pipeline if not given
+    data_dir = data_dir or build.data_dir
+
+    # Choose the number of shards from the memory limit if it is not given
+    if shards is None:
+        shards = shard_count(data_dir, memory_limit)
+
+    # Partition the raw files into shards in a temporary directory, unless one is given
+    with tempfile.TemporaryDirectory(dir=shard_dir) as working_dir:
+        client_order, psc_categories = partition(
+            data_dir, working_dir, shards, chunksize
+        )
+
+        # Load the market series once and share it between all shards
+        market_performance = RawTables(data_dir)["market_performance"]
+
+        datasets = []
+        for shard in range(shards):
+            shard_path = os.path.join(working_dir, "shard_{:04d}".format(shard))
+
+            # Give every shard the same "PSC" categories, so that all shards get the same one-hot columns
+            clients = read_clients(os.path.join(shard_path, TABLES["clients"][0]))
+            clients["PSC"] = clients["PSC"].cat.set_categories(psc_categories)
+
+            tables = RawTables(
+                shard_path,
+                frames={"clients": clients, "market_performance": market_performance},
+            )
+            datasets.append(build.create_dataset(windows, tables, keep_id=True))
+
+    # Concatenate the non-empty shards and restore the order of the clients in the Clients data
+    dataset = pd.concat(
+        [dataset for dataset in datasets if len(dataset)] or datasets[:1],
+        ignore_index=True,
+    )
+    position = pd.Series(np.arange(len(client_order)), index=client_order)
+    position = position[~position.index.duplicated()]
+    dataset = dataset.iloc[
+        np.argsort(position.loc[dataset["ID_CLIENTE"]].to_numpy(), kind="mergesort")
+    ]
+
+    # Remove the client ID, like the in-memory pipeline does
+    return dataset.drop("ID_CLIENTE", axis=1).reset_index(drop=True)
@@ -0,0 +1,165 @@
+"""Generate synthetic raw tables with the schema of the files in data/.
+
+The files have the names, columns, separators and date formats read by
+raw_tables.py, with the "(null)" markers of the real exports, so every
+builder can run on them at any size. They are written in blocks of clients,
+which keeps the memory used by the generator bounded.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .raw_tables import DEFAULT_CLOSING_DATE, SEPARATORS, TABLES
+
+# Define the values of the categorical columns
+PSC_PROFILES = ["A", "B", "C", "D", "E"]
+TRANSACTION_TYPES = ["ACQUISTO TITOLI", "VENDITA TITOLI", "CEDOLA", "COMMISSIONI"]
+TRANSACTION_WEIGHTS = [0.4, 0.3, 0.2, 0.1]
+
+# Define the columns of the Clients data that are dropped by the builders, with a constant value
+CLIENT_CONSTANTS = {
+    "DATA_DECESSO": "(null)",
+    "TIPO_SOGGETTO_DESC": "PERSONA FISICA",
+    "DATAINSERIMENTO": "2010-01-01",
+    "TIPO_CATEGORIA": 1,
+    "ID_FILIALE": 1,
+    "SESSO": "M",
+    "ID_AGENTE": 1,
+    "STATUS_DESC": "ATTIVO",
+}
+
+
+def _dates(end_date, days_before):
+    # Format the dates a number of days before the end date as "YYYY-MM-DD" strings
+    dates = np.datetime64(end_date, "D") - days_before.astype("timedelta64[D]")
+    return np.datetime_as_string(dates, unit="D")
+
+
+def _write(frame, data_dir, name, first):
+    # Write a block of rows of a table, with the header only in the first block
+    frame.to_csv(
+        os.path.join(data_dir, TABLES[name][0]),
+        sep=SEPARATORS[name],
+        index=False,
+        header=first,
+        mode="w" if first else "a",
+    )
+
+
+def client_block(rng, client_ids, first_contract_id, end_date, sizes):
+    # Generate the Clients, Contracts, Advisory Performance and Transactions rows of a block of clients
+    num_clients = len(client_ids)
+
+    # Clients: the one-hot encoded "PSC" profile and the columns dropped by the builders
+    clients = pd.DataFrame({"ID_CLIENTE": client_ids})
+    for column, value in CLIENT_CONSTANTS.items():
+        clients[column] = value
+    clients["PSC"] = rng.choice(PSC_PROFILES, num_clients)
+
+    # Contracts: at least one per client, half of them closed, a few without an opening date
+    contracts_per_client = 1 + rng.poisson(sizes["contracts"] - 1, num_clients)
+    num_contracts = int(contracts_per_client.sum())
+    closed = rng.random_sample(num_contracts) < 0.5
+    opened = rng.randint(30, 2000, num_contracts)
+    closed_after = np.minimum(rng.randint(10, 800, num_contracts), opened)
+    contracts = pd.DataFrame(
+        {
+            "ID": first_contract_id + np.arange(num_contracts),
+            "CLIENTE": np.repeat(client_ids, contracts_per_client),
+            "STATO": np.where(closed, 2, 1),
+            "DATA_APERTURA": np.where(
+                rng.random_sample(num_contracts) < 0.02,
+                "(null)",
+                _dates(end_date, opened),
+            ),
+            "DATA_CHIUSURA": np.where(
+                closed, _dates(end_date, opened - closed_after), "(null)"
+            ),
+        }
+    )
+
+    # Advisory Performance: consecutive two-week periods back from a last date per client
+    periods_per_client = rng.randint(
+        sizes["advisory"] // 2, sizes["advisory"] * 3 // 2 + 1, num_clients
+    )
+    num_periods = int(periods_per_client.sum())
+    last_end = np.repeat(rng.randint(0, 200, num_clients), periods_per_client)
+    period = np.arange(num_periods) - np.repeat(
+        np.cumsum(periods_per_client) - periods_per_client, periods_per_client
+    )
+    period_end = last_end + 14 * period
+    advisory_performance = pd.DataFrame(
+        {
+            "ID_CLIENTE": np.repeat(client_ids, periods_per_client),
+            "DT_INIZIO_PERIODO": _dates(
+                end_date, period_end + rng.choice([0, 6, 13], num_periods)
+            ),
+            "DT_FINE_PERIODO": _dates(end_date, period_end),
+            "VERSATO_NETTO": rng.normal(100, 500, num_periods).round(2),
+            "RENDIMENTO": rng.normal(5, 20, num_periods).round(2),
+        }
+    )
+
+    # Transactions: a random number of purchases, sales, coupons and fees per contract
+    transactions_per_contract = rng.poisson(sizes["transactions"], num_contracts)
+    num_transactions = int(transactions_per_contract.sum())
+    transactions = pd.DataFrame(
+        {
+            "ID_CONTRATTO": np.repeat(
+                contracts["ID"].to_numpy(), transactions_per_contract
+            ),
+            "ID_CLIENTE": np.repeat(
+                contracts["CLIENTE"].to_numpy(), transactions_per_contract
+            ),
+            "DATA_CONTABILE": _dates(end_date, rng.randint(0, 400, num_transactions)),
+            "NOME": rng.choice(
+                TRANSACTION_TYPES, num_transactions, p=TRANSACTION_WEIGHTS
+            ),
+            "IMP_LORDO": rng.uniform(10, 5000, num_transactions).round(2),
+        }
+    )
+
+    return clients, contracts, advisory_performance, transactions
+
+
+def generate(
+    data_dir,
+    clients=10000,
+    contracts=2.5,
+    advisory=15,
+    transactions=6,
+    market_years=3,
+    seed=0,
+    block_size=100000,
+    end_date=DEFAULT_CLOSING_DATE,
+):
+    # Generate the raw tables of 'clients' clients, with on average 'contracts' contracts per client,
+    # 'advisory' advisory periods per client and 'transactions' transactions per contract
+    rng = np.random.RandomState(seed)
+    sizes = {"contracts": contracts, "advisory": advisory, "transactions": transactions}
+    os.makedirs(data_dir, exist_ok=True)
+
+    # Generate one daily market return per business day
+    market_dates = pd.bdate_range(end=end_date, periods=int(market_years * 261))
+    market_performance = pd.DataFrame(
+        {
+            "DATA": market_dates.strftime("%Y-%m-%d"),
+            "REND_GIORN": rng.normal(0, 1, len(market_dates)).round(4),
+        }
+    )
+    _write(market_performance, data_dir, "market_performance", True)
+
+    # Generate and write the other tables one block of clients at a time
+    next_contract_id = 1
+    for start in range(0, max(clients, 1), block_size):
+        client_ids = np.arange(start, min(start + block_size, clients)) + 1
+        blocks = client_block(rng, client_ids, next_contract_id, end_date, sizes)
+        for name, block in zip(
+            ["clients", "contracts", "advisory_performance", "transactions"], blocks
+        ):
+            _write(block, data_dir, name, start == 0)
+        next_contract_id += len(blocks[1])
+
+    return data_dir
@@ -0,0 +1,139 @@
+"""Persistent columnar cache of the parsed raw tables.
+
+Each cleaned table is stored as an uncompressed Feather file, so a warm
+rebuild loads typed columns through memory mapping instead of re-parsing the
+CSV. Entries are keyed by the size, modification time and SHA-256 content
+hash of the source file, and are rebuilt automatically when the file changes.
+Every entry is written atomically with ``write_atomic``, which the other
+on-disk caches and outputs of the project share.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+# Bump when a reader changes the schema or cleaning of the tables it returns
+CACHE_VERSION = 1
+
+# Read the umask of the process once, to give the written files the permissions of open()
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def fingerprint(path, content_hash=True):
+    # Describe the source file by its size, modification time and, optionally, content hash
+    stat = os.stat(path)
+    file_fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if content_hash:
+        file_fingerprint["sha256"] = file_hash(path)
+    return file_fingerprint
+
+
+def file_hash(path, block_size=1 << 20):
+    # Hash the file content in fixed-size blocks to keep memory bounded
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def write_atomic(path, write):
+    # Call write() on a uniquely named temporary file next to the path, then move it into place, so
+    # that an interrupted run never leaves a partial file and concurrent writers never collide
+    handle, temporary_path = tempfile.mkstemp(
+        prefix=os.path.basename(path) + ".",
+        suffix=".tmp",
+        dir=os.path.dirname(path) or ".",
+    )
+    os.close(handle)
+    try:
+        os.chmod(temporary_path, 0o666 & ~_UMASK)
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary_path)
+        raise
+
+
+def write_pickle(path, value):
+    # Pickle a value atomically
+    def write(temporary_path):
+        with open(temporary_path, "wb") as handle:
+            pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    write_atomic(path, write)
+
+
+def write_json(path, value):
+    # Write a value as indented JSON atomically
+    def write(temporary_path):
+        with open(temporary_path, "w") as handle:
+            json.dump(value, handle, indent=2)
+
+    write_atomic(path, write)
+
+
+def cached_read(source_path, reader, cache_dir, name=None):
+    from pyarrow import feather
+
+    name = name or os.path.splitext(os.path.basename(source_path))[0]
+    table_path = os.path.join(cache_dir, name + ".feather")
+    manifest_path = os.path.join(cache_dir, name + ".json")
+    manifest = _read_manifest(manifest_path)
+
+    # Check that the entry was written by the same reader and cache version
+    valid = (
+        manifest is not None
+        and manifest.get("version") == CACHE_VERSION
+        and manifest.get("reader") == reader.__name__
+        and os.path.exists(table_path)
+    )
+
+    # Unchanged size and modification time mean the entry is fresh without hashing the file
+    current = fingerprint(source_path, content_hash=False)
+    source = manifest["source"] if valid else {}
+    fresh = valid and all(source.get(key) == current[key] for key in current)
+
+    # Otherwise compare the content hash, e.g. after a copy that only touched the mtime
+    if valid and not fresh:
+        current["sha256"] = file_hash(source_path)
+        fresh = all(source.get(key) == current[key] for key in ("size", "sha256"))
+        if fresh:
+            manifest["source"] = current
+            write_json(manifest_path, manifest)
+
+    if fresh:
+        # Load the typed columns through memory mapping
+        return feather.read_table(table_path, memory_map=True).to_pandas()
+
+    # Fingerprint the source before parsing it, so a concurrent change invalidates the entry
+    if "sha256" not in current:
+        current["sha256"] = file_hash(source_path)
+
+    # Parse the source file and store the cleaned table for the next run
+    frame = reader(source_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_atomic(
+        table_path,
+        lambda temporary_path: feather.write_feather(
+            frame.reset_index(drop=True), temporary_path, compression="uncompressed"
+        ),
+    )
+    write_json(
+        manifest_path,
+        {"version": CACHE_VERSION, "reader": reader.__name__, "source": current},
+    )
+    return frame
@@ -0,0 +1,141 @@
+"""Lookback window specification shared by every feature builder."""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+_ORDINAL_UNITS = [
+    "",
+    "FIRST",
+    "SECOND",
+    "THIRD",
+    "FOURTH",
+    "FIFTH",
+    "SIXTH",
+    "SEVENTH",
+    "EIGHTH",
+    "NINTH",
+    "TENTH",
+    "ELEVENTH",
+    "TWELFTH",
+    "THIRTEENTH",
+    "FOURTEENTH",
+    "FIFTEENTH",
+    "SIXTEENTH",
+    "SEVENTEENTH",
+    "EIGHTEENTH",
+    "NINETEENTH",
+]
+_TENS = [
+    "",
+    "",
+    "TWENTY",
+    "THIRTY",
+    "FORTY",
+    "FIFTY",
+    "SIXTY",
+    "SEVENTY",
+    "EIGHTY",
+    "NINETY",
+]
+
+
+def ordinal(number):
+    # Spell out ordinals up to 99 (e.g. "SECOND", "TWENTY-FOURTH"), then fall back to digits
+    if number < 20:
+        return _ORDINAL_UNITS[number]
+    if number < 100:
+        tens, units = divmod(number, 10)
+        if units == 0:
+            return _TENS[tens][:-1] + "IETH"
+        return _TENS[tens] + "-" + _ORDINAL_UNITS[units]
+    return str(number) + "TH"
+
+
+class WindowSpec(namedtuple("WindowSpec", ["count", "width", "offset", "unit"])):
+    """``count`` consecutive windows of ``width`` days before a reference date.
+
+    The most recent window ends ``offset`` days before the reference date
+    (the churn date or the last advisory date of a client) and window ``i``
+    covers the days ``[offset + width * (i + 1), offset + width * i)`` before
+    it. ``unit`` is the name of one window in the generated column names.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, count=6, width=28, offset=0, unit="MONTH"):
+        # The REGRESS_* slopes are fitted on every window but the most recent, so they need at
+        # least two of them
+        if count < 3:
+            raise ValueError("count must be at least 3, got {!r}".format(count))
+        return super().__new__(cls, count, width, offset, unit)
+
+    @property
+    def days(self):
+        # Distance in days between the reference date and the start of each window
+        return self.offset + self.width * np.arange(1, self.count + 1)
+
+    def start(self, reference_date, i):
+        # First date of window i, counting back from the reference date
+        return reference_date - pd.to_timedelta(int(self.days[i]), unit="d")
+
+    def end(self, reference_date, i):
+        # Date right after the end of window i, counting back from the reference date
+        return reference_date - pd.to_timedelta(
+            int(self.days[i]) - self.width, unit="d"
+        )
+
+    def window_of(self, reference_date, date):
+        # Index of the window containing each date counting back from its reference date, or -1
+        # if the date falls in no window (or either date is missing)
+        day = np.timedelta64(1, "D").astype("timedelta64[ns]").astype("int64")
+        reference_date = np.asarray(reference_date, dtype="datetime64[ns]")
+        date = np.asarray(date, dtype="datetime64[ns]")
+        distance = (reference_date - date).astype("int64") - self.offset * day
+        window = (distance - 1) // (self.width * day)
+        outside = (
+            (distance <= 0)
+            | (window >= self.count)
+            | np.isnat(reference_date)
+            | np.isnat(date)
+        )
+        return np.where(outside, -1, window)
+
+    def window_range(self, reference_date, start, end):
+        # First and last index of the windows containing each period [start, end] counting back
+        # from its reference date, with first > last if the period falls in no window
+        day = np.timedelta64(1, "D").astype("timedelta64[ns]").astype("int64")
+        width = self.width * day
+        reference_date = np.asarray(reference_date, dtype="datetime64[ns]")
+        start = np.asarray(start, dtype="datetime64[ns]")
+        end = np.asarray(end, dtype="datetime64[ns]")
+        to_start = (reference_date - start).astype("int64") - self.offset * day
+        to_end = (reference_date - end).astype("int64") - self.offset * day
+        first = np.maximum(-(-to_start // width) - 1, 0)
+        last = np.minimum(to_end // width, self.count - 1)
+        missing = np.isnat(reference_date) | np.isnat(start) | np.isnat(end)
+        return first, np.where(missing, -1, last)
+
+    @property
+    def periods(self):
+        # Name the windows "LAST", "SECOND-LAST", "THIRD-LAST", ... from the most recent one
+        return ["LAST"] + [ordinal(i) + "-LAST" for i in range(2, self.count + 1)]
+
+    def names(self, prefix):
+        # Name the columns of a windowed feature, e.g. "NET_PAID_SECOND-LAST_MONTH"
+        return [prefix + "_" + period + "_" + self.unit for period in self.periods]
+
+    def names_before(self, prefix):
+        # Name the columns of a feature counted back from a date, e.g. "ACTIVE_CONTRACTS_2_MONTH_BEFORE"
+        return [
+            prefix + "_" + str(i) + "_" + self.unit + "_BEFORE"
+            for i in range(1, self.count + 1)
+        ]
+
+
+def window_spec(windows):
+    # Accept either a window specification or the day offset of the default windows
+    if isinstance(windows, WindowSpec):
+        return windows
+    return WindowSpec(offset=windows)